@@ -0,0 +1,337 @@
+import argparse
+import datetime
+import importlib
+import json
+import cv2
+import numpy as np
+from class_dispatch import ClassDispatcher
+from detection_engine import CLASSES, DetectionEngine
+from tracking_loop import open_capture
+from motion_gate import GatedDetector, MotionGate
+from proximity import ProximityEngine
+from dwell_accounting import DwellAccumulator
+
+# an example configuration, also the defaults of the options a
+# configuration file leaves out. A plugin "type" is either one of the
+# PLUGINS below or "module:Class" for a user-defined plugin, the other
+# keys of the entry are passed to its constructor, except "classes"
+# which selects the classes it watches. The trackers use the Kalman
+# filter when the detector skips frames (see tracker_options) unless
+# "tracker" sets "kalman"
+DEFAULT_CONFIG = {
+    "video": "test_video.mp4",
+    "width": 600,
+    "interval": 1,
+    "motion_gate": False,
+    "detector": {},
+    "tracker": {"maxDisappeared": 80, "maxDistance": 90},
+    "plugins": [
+        {"type": "counter"},
+        {"type": "dwell"},
+        {"type": "trail", "length": 64},
+        {"type": "proximity", "distance": 75.0},
+    ],
+}
+
+
+class AnalyticsPlugin:
+    # base class of the analytics run by an AnalyticsHost. The host
+    # detects and tracks once per frame and hands the same track arrays
+    # to every plugin of a partition, so a plugin only keeps its own
+    # metric. Override:
+    #   process  -- consume the tracks of a frame
+    #   draw     -- render the metric onto the frame (optional)
+    #   summary  -- JSON-friendly results, reported at the end of a run
+    name = "plugin"
+
+    # the classes the plugin watches, and the trail points the tracker
+    # of its partition has to keep for it
+    classes = ("person",)
+    trailLength = 0
+
+    def attach(self, host, subscription):
+        self.host = host
+        self.partition = subscription.name
+        self.tracker = subscription.tracker
+
+    def process(self, index, timestamp, ids, centroids, boxes):
+        pass
+
+    def draw(self, frame, ids, centroids, boxes):
+        pass
+
+    def summary(self):
+        return {}
+
+
+class CounterPlugin(AnalyticsPlugin):
+    # live count (LPC) and number of objects seen so far (OPC)
+    name = "counter"
+
+    def __init__(self):
+        self.live = 0
+        self.peak = 0
+        self.seen = np.zeros(0, dtype=bool)
+
+    def process(self, index, timestamp, ids, centroids, boxes):
+        self.live = len(ids)
+        self.peak = max(self.peak, self.live)
+        if len(ids) > 0 and ids.max() >= len(self.seen):
+            self.seen = np.concatenate([self.seen, np.zeros(ids.max() + 1 - len(self.seen), dtype=bool)])
+        self.seen[ids] = True
+
+    def draw(self, frame, ids, centroids, boxes):
+        cv2.putText(frame, "LPC: {}".format(self.live), (5, 60), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 255), 1)
+        cv2.putText(frame, "OPC: {}".format(int(self.seen.sum())), (5, 90), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1,
+                    (0, 0, 255), 1)
+
+    def summary(self):
+        return dict(total=int(self.seen.sum()), peak=self.peak)
+
+
+class DwellPlugin(AnalyticsPlugin):
+    # time every object has been tracked, in total and in the optional
+    # zones, from the timestamps of the frames (not the wall clock)
+    name = "dwell"
+
+    def __init__(self, zones=()):
+        self.accumulator = DwellAccumulator(zones)
+        self.records = []
+
+    def process(self, index, timestamp, ids, centroids, boxes):
+        finished = self.accumulator.update(ids, centroids, timestamp)
+        if len(finished) > 0:
+            self.records.append(finished)
+
+    def draw(self, frame, ids, centroids, boxes):
+        for (objectId, seconds, box) in zip(ids.tolist(), self.accumulator.dwell(ids).tolist(),
+                                            boxes.astype("int").tolist()):
+            cv2.putText(frame, "{}|{}".format(objectId, int(seconds)), (box[0], box[1] - 5),
+                        cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 255), 1)
+
+    def summary(self):
+        # the objects still tracked count with their dwell so far
+        records = np.concatenate(self.records + [self.accumulator.active()])
+        dwell = records["dwell"]
+        return dict(mean_seconds=float(dwell.mean()) if len(dwell) else 0.0,
+                    max_seconds=float(dwell.max()) if len(dwell) else 0.0,
+                    zone_seconds=records["zones"].sum(axis=0).tolist(),
+                    seconds={str(objectId): round(seconds, 3) for (objectId, seconds)
+                             in zip(records["objectID"].tolist(), dwell.tolist())})
+
+
+class TrailPlugin(AnalyticsPlugin):
+    # the path of every tracked object, kept by the tracker of its
+    # partition
+    name = "trail"
+
+    def __init__(self, length=64, color=(0, 255, 0), thickness=2):
+        self.trailLength = length
+        self.color = tuple(color)
+        self.thickness = thickness
+
+    def draw(self, frame, ids, centroids, boxes):
+        for (cX, cY) in centroids.astype("int").tolist():
+            cv2.circle(frame, (cX, cY), 4, self.color, -1)
+        self.tracker.drawTrails(frame, self.color, self.thickness)
+
+
+class ProximityPlugin(AnalyticsPlugin):
+    # objects closer than `distance` pixels (centroid to centroid) to
+    # any other object are flagged, their boxes are drawn in red. The
+    # flagged objects linked by close pairs form clusters
+    name = "proximity"
+
+    def __init__(self, distance=75.0, method="auto"):
+        self.engine = ProximityEngine(distance, method)
+        self.flags = np.zeros(0, dtype=bool)
+        self.violations = 0
+        self.peak = 0
+        self.largestCluster = 0
+
+    def process(self, index, timestamp, ids, centroids, boxes):
+        (_, self.flags, clusters) = self.engine.check(centroids)
+        self.violations += int(self.flags.sum())
+        self.peak = max(self.peak, int(self.flags.sum()))
+        if self.flags.any():
+            self.largestCluster = max(self.largestCluster, int(np.bincount(clusters[self.flags]).max()))
+
+    def draw(self, frame, ids, centroids, boxes):
+        for (flag, box) in zip(self.flags.tolist(), boxes.astype("int").tolist()):
+            color = (0, 0, 255) if flag else (0, 255, 0)
+            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), color, 2)
+
+    def summary(self):
+        return dict(flagged_detections=self.violations, peak_flagged=self.peak,
+                    largest_cluster=self.largestCluster)
+
+
+PLUGINS = {
+    "counter": CounterPlugin,
+    "dwell": DwellPlugin,
+    "trail": TrailPlugin,
+    "proximity": ProximityPlugin,
+}
+
+
+def partition_name(classes):
+    return "+".join(classes)
+
+
+def create_plugin(spec):
+    # build a plugin from its configuration entry, "classes" optionally
+    # lists the classes it watches (people by default)
+    options = dict(spec)
+    kind = options.pop("type")
+    classes = options.pop("classes", None)
+    if kind in PLUGINS:
+        plugin = PLUGINS[kind](**options)
+    elif ":" in kind:
+        (module, name) = kind.split(":", 1)
+        plugin = getattr(importlib.import_module(module), name)(**options)
+    else:
+        raise ValueError("unknown analytics plugin: {}".format(kind))
+
+    if classes is not None:
+        plugin.classes = tuple(classes)
+    return plugin
+
+
+class AnalyticsHost:
+    def __init__(self, detector, plugins=(), trackerOptions=None, interval=1):
+        # run the detector (every `interval` frames) once per frame and
+        # fan its detections out to every registered plugin, so any
+        # number of analytics cost a single inference. The plugins that
+        # watch the same classes share a tracker partition, plugins of
+        # different classes (people, pets, vehicles) get separate ones
+        self.detector = detector
+        self.dispatcher = ClassDispatcher(detector, interval)
+        self.trackerOptions = dict(trackerOptions or {})
+        self.plugins = []
+        plugins = list(plugins)
+
+        # every partition keeps trails as long as the longest any of
+        # its plugins needs
+        trailLengths = {}
+        for plugin in plugins:
+            key = partition_name(plugin.classes)
+            trailLengths[key] = max(trailLengths.get(key, 0), plugin.trailLength)
+        for plugin in plugins:
+            self.add(plugin, trailLengths[partition_name(plugin.classes)])
+
+    def add(self, plugin, trailLength=0):
+        name = partition_name(plugin.classes)
+        subscription = self.dispatcher.subscriptions.get(name)
+        if subscription is None:
+            options = dict(self.trackerOptions)
+            trailLength = max(trailLength, plugin.trailLength, options.get("trailLength", 0))
+            if trailLength > 0:
+                options["trailLength"] = trailLength
+            subscription = self.dispatcher.subscribe(name, plugin.classes, options)
+
+        trajectories = subscription.tracker.trajectories
+        if plugin.trailLength > 0 and (trajectories is None or trajectories.length < plugin.trailLength):
+            raise ValueError("the {} tracker keeps no trails of {} points".format(name, plugin.trailLength))
+        plugin.attach(self, subscription)
+        self.plugins.append(plugin)
+
+    def process(self, frame, index, timestamp):
+        # detect and track one frame, then run every plugin on the
+        # tracks of its partition. Returns {partition: (ids, centroids,
+        # boxes)}
+        tracks = self.dispatcher.process(frame, index)
+        for plugin in self.plugins:
+            plugin.process(index, timestamp, *tracks[plugin.partition])
+        return tracks
+
+    def draw(self, frame, tracks):
+        for (ids, _, boxes) in tracks.values():
+            for box in boxes.astype("int").tolist():
+                cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 0, 255), 2)
+        for plugin in self.plugins:
+            plugin.draw(frame, *tracks[plugin.partition])
+        return frame
+
+    def summary(self):
+        # the results of every plugin, under its name -- followed by its
+        # partition for the plugins of other classes than people
+        return {plugin.name if plugin.partition == "person" else "{}:{}".format(plugin.name, plugin.partition):
+                plugin.summary() for plugin in self.plugins}
+
+    def run(self, source, width=600, display=True):
+        # process a whole video (or camera) and return the summary of
+        # every plugin. The frame timestamps come from the source, so
+        # recorded videos can be processed faster than real time
+        cap = open_capture(source, self.detector, width)
+
+        fps_start_time = datetime.datetime.now()
+        index = 0
+        while True:
+            ret, frame, msec = cap.readTimed()
+            if not ret:
+                break
+
+            tracks = self.process(frame, index, msec / 1000.0)
+            index += 1
+
+            if display:
+                self.draw(frame, tracks)
+                time_diff = datetime.datetime.now() - fps_start_time
+                fps = index / time_diff.total_seconds() if time_diff.total_seconds() > 0 else 0.0
+                cv2.putText(frame, "FPS: {:.2f}".format(fps), (5, 30), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1,
+                            (0, 0, 255), 1)
+
+                cv2.imshow("Application", frame)
+                key = cv2.waitKey(1)
+                if key == ord('q'):
+                    break
+
+        cap.stop()
+        if display:
+            cv2.destroyAllWindows()
+        return dict(frames=index, analytics=self.summary())
+
+
+def load_config(path=None):
+    # the configuration of a JSON file on top of DEFAULT_CONFIG
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path is not None:
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def build_host(config):
+    # the detector keeps the classes of all the plugins unless the
+    # configuration says otherwise, its confidence may be a per class
+    # {class name: threshold} dict
+    plugins = [create_plugin(spec) for spec in config["plugins"]]
+    options = dict(config["detector"])
+    options.setdefault("classes", sorted(set(c for plugin in plugins for c in plugin.classes), key=CLASSES.index))
+    detector = DetectionEngine(**options)
+    if config["motion_gate"]:
+        detector = GatedDetector(detector, MotionGate())
+    return AnalyticsHost(detector, plugins, config["tracker"], config["interval"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several person analytics on one detection and tracking pass")
+    parser.add_argument("-c", "--config", default=None, help="JSON configuration file")
+    parser.add_argument("--video", default=None, help="video to process, overrides the configuration")
+    parser.add_argument("--no-display", action="store_true", help="process the video without showing it")
+    parser.add_argument("-o", "--output", default=None, help="JSON file to write the summary to")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    host = build_host(config)
+    summary = host.run(args.video or config["video"], config["width"], not args.no_display)
+
+    print("[INFO] {} frames processed".format(summary["frames"]))
+    print(json.dumps(summary["analytics"], indent=2))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+import numpy as np
+from centroidtracker import CentroidTracker
+from detection_engine import DetectionEngine
+from inference_backends import set_threads
+from tracking_loop import open_capture, tracker_options
+from trackersnapshot import load_snapshot, save_snapshot
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".mpg", ".mpeg")
+
+# a worker reports its progress every PROGRESS_EVERY frames
+PROGRESS_EVERY = 100
+
+# checkpoint of a video being processed, in its output directory
+CHECKPOINT_NAME = "checkpoint.snapshot"
+
+# the detector and the progress queue of a worker process
+_detector = None
+_progress = None
+
+
+def find_videos(directories, extensions=VIDEO_EXTENSIONS):
+    # every video below the given directories, in a stable order
+    videos = []
+    for directory in directories:
+        for (root, _, files) in os.walk(directory):
+            videos.extend(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+    return sorted(videos)
+
+
+def output_names(videos):
+    # one output name per video, made unique when two directories hold
+    # videos with the same name
+    names = []
+    seen = {}
+    for path in videos:
+        name = os.path.splitext(os.path.basename(path))[0]
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else "{}-{}".format(name, seen[name]))
+    return names
+
+
+def _init_worker(progress, engineOptions):
+    # every worker is single threaded, the pool provides the parallelism
+    global _detector, _progress
+    set_threads(1)
+    _detector = DetectionEngine(**engineOptions)
+    _progress = progress
+
+
+def process_video(job):
+    # run detect -> track -> count on one video with no GUI and write:
+    #   detections.csv  -- frame, startX, startY, endX, endY, score, class
+    #   tracks.csv      -- frame, objectID, startX, startY, endX, endY
+    #   summary.json    -- counts and throughput of the video
+    # Every checkpointInterval frames the tracker state, the partial
+    # counts and the committed length of the CSV files are saved in one
+    # snapshot. A video whose snapshot exists is resumed from it: the
+    # CSV files are cut back to their committed length and decoding
+    # seeks straight to the next frame. When a CSV file no longer holds
+    # what the snapshot committed, the video starts over
+    (path, outputDir, width, interval, checkpointInterval) = job
+    os.makedirs(outputDir, exist_ok=True)
+    name = os.path.basename(outputDir)
+    checkpointPath = os.path.join(outputDir, CHECKPOINT_NAME)
+    detectionPath = os.path.join(outputDir, "detections.csv")
+    trackPath = os.path.join(outputDir, "tracks.csv")
+
+    state = dict(frames=0, detected=0, peak=0, present=0, seconds=0.0, detectionBytes=0, trackBytes=0)
+    tracker = None
+    if os.path.exists(checkpointPath):
+        (tracker, extra) = load_snapshot(checkpointPath)
+        if all(os.path.exists(csvPath) and os.path.getsize(csvPath) >= extra[key]
+               for (csvPath, key) in ((detectionPath, "detectionBytes"), (trackPath, "trackBytes"))):
+            state.update(extra)
+        else:
+            print("[INFO] {}: the CSV files do not match the checkpoint, starting over".format(name))
+            tracker = None
+    if tracker is None:
+        tracker = CentroidTracker(**tracker_options(interval, maxDisappeared=80, maxDistance=90))
+    resumed = state["frames"]
+
+    cap = open_capture(path, _detector, width, startFrame=resumed)
+    start = time.perf_counter()
+    with open(detectionPath, "r+" if resumed else "w", newline="") as detectionFile, \
+            open(trackPath, "r+" if resumed else "w", newline="") as trackFile:
+        detectionWriter = csv.writer(detectionFile)
+        trackWriter = csv.writer(trackFile)
+        if resumed:
+            for (f, size) in ((detectionFile, state["detectionBytes"]), (trackFile, state["trackBytes"])):
+                f.truncate(size)
+                f.seek(size)
+        else:
+            detectionWriter.writerow(["frame", "startX", "startY", "endX", "endY", "score", "class"])
+            trackWriter.writerow(["frame", "objectID", "startX", "startY", "endX", "endY"])
+
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            frames = state["frames"]
+            tracker.predict()
+            if frames % interval == 0:
+                detections = _detector.detect(frame)
+                tracker.update(detections[:, :4].astype("int"))
+                state["detected"] += len(detections)
+                detectionWriter.writerows([frames] + [int(v) for v in row[:4]] + [round(row[4], 4), int(row[5])]
+                                          for row in detections.tolist())
+
+            (ids, _, boxes) = tracker.tracks()
+            column = np.full((len(ids), 1), frames)
+            trackWriter.writerows(np.hstack([column, ids[:, None], boxes.astype("int")]).tolist())
+            state["peak"] = max(state["peak"], len(ids))
+            state["present"] += len(ids)
+
+            state["frames"] += 1
+            if state["frames"] % PROGRESS_EVERY == 0:
+                fps = (state["frames"] - resumed) / (time.perf_counter() - start)
+                _progress.put(("progress", os.getpid(), name, state["frames"], cap.frameCount, fps))
+
+            if checkpointInterval > 0 and state["frames"] % checkpointInterval == 0:
+                detectionFile.flush()
+                trackFile.flush()
+                state.update(detectionBytes=detectionFile.tell(), trackBytes=trackFile.tell())
+                checkpoint = dict(state, seconds=state["seconds"] + time.perf_counter() - start)
+                save_snapshot(tracker, checkpointPath, checkpoint)
+                _progress.put(("checkpoint", name, state["frames"]))
+
+    cap.stop()
+    seconds = state["seconds"] + time.perf_counter() - start
+    summary = dict(video=path, frames=state["frames"], detections=state["detected"], people=tracker.nextObjectID,
+                   peak_people=state["peak"], mean_people=state["present"] / float(max(state["frames"], 1)),
+                   seconds=seconds, fps=state["frames"] / max(seconds, 1e-9), resumed_from=resumed,
+                   worker=os.getpid())
+    with open(os.path.join(outputDir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    # the video is complete, its checkpoint is not needed anymore
+    if os.path.exists(checkpointPath):
+        os.remove(checkpointPath)
+    return summary
+
+
+class Manifest:
+    def __init__(self, path):
+        # progress of every video of a run: status (pending, running or
+        # done), last committed frame and checkpoint file. It is
+        # rewritten atomically on every change, a killed run leaves a
+        # readable manifest to resume from
+        self.path = path
+        self.videos = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.videos = json.load(f)["videos"]
+
+    def status(self, name):
+        return self.videos.get(name, {}).get("status", "pending")
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.videos.setdefault(name, {}).update(fields)
+            temp = self.path + ".tmp"
+            with open(temp, "w") as f:
+                json.dump(dict(videos=self.videos), f, indent=2, sort_keys=True)
+            os.replace(temp, self.path)
+
+
+def _report(progress, manifest):
+    # print the progress messages of the workers and record their
+    # checkpoints in the manifest until told to stop
+    while True:
+        message = progress.get()
+        if message is None:
+            break
+        if message[0] == "checkpoint":
+            (_, name, frames) = message
+            manifest.update(name, status="running", frame=frames)
+            continue
+        (_, worker, name, frames, total, fps) = message
+        done = " ({:.0f}%)".format(100.0 * frames / total) if total > 0 else ""
+        print("[INFO] worker {}: {} frame {}{} at {:.1f} FPS".format(worker, name, frames, done, fps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless person analytics over directories of videos")
+    parser.add_argument("directories", nargs="+", help="directories to search for videos")
+    parser.add_argument("-o", "--output", default="analytics_output", help="directory to write the results to")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--width", type=int, default=600, help="width the frames are resized to")
+    parser.add_argument("--interval", type=int, default=1, help="run the detector every Nth frame")
+    parser.add_argument("--confidence", type=float, default=0.5, help="minimum detection score")
+    parser.add_argument("--backend", default=None, help="inference backend name, or auto")
+    parser.add_argument("--checkpoint", type=int, default=1000,
+                        help="checkpoint every N frames so a killed run can resume (0 to disable)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.directories)
+    if not videos:
+        raise SystemExit("no video found in {}".format(", ".join(args.directories)))
+    os.makedirs(args.output, exist_ok=True)
+    engineOptions = dict(confidence=args.confidence, backend=args.backend)
+
+    # the videos completed by a previous run are not processed again,
+    # the interrupted ones resume from their last checkpoint
+    manifest = Manifest(os.path.join(args.output, "manifest.json"))
+    summaries = []
+    jobs = []
+    names = dict(zip(videos, output_names(videos)))
+    for (path, name) in names.items():
+        outputDir = os.path.join(args.output, name)
+        if manifest.status(name) == "done" and os.path.exists(os.path.join(outputDir, "summary.json")):
+            with open(os.path.join(outputDir, "summary.json")) as f:
+                summaries.append(json.load(f))
+            continue
+        manifest.update(name, video=path, status="running" if manifest.status(name) == "running" else "pending",
+                        checkpoint=os.path.join(outputDir, CHECKPOINT_NAME))
+        jobs.append((path, outputDir, args.width, args.interval, args.checkpoint))
+    if summaries:
+        print("[INFO] {} videos already done, {} to process".format(len(summaries), len(jobs)))
+
+    start = time.perf_counter()
+    total = len(summaries) + len(jobs)
+    if jobs:
+        # load the network before forking, the workers share it
+        if mp.get_start_method() == "fork":
+            DetectionEngine(**engineOptions)
+
+        progress = mp.Queue()
+        reporter = threading.Thread(target=_report, args=(progress, manifest), daemon=True)
+        reporter.start()
+
+        with mp.Pool(max(min(args.workers, len(jobs)), 1), initializer=_init_worker,
+                     initargs=(progress, engineOptions)) as pool:
+            for summary in pool.imap_unordered(process_video, jobs):
+                summaries.append(summary)
+                manifest.update(names[summary["video"]], status="done", frame=summary["frames"])
+                print("[INFO] done {} ({}/{}): {} frames, {} people, {:.1f} FPS".format(
+                    summary["video"], len(summaries), total, summary["frames"], summary["people"], summary["fps"]))
+        progress.put(None)
+        reporter.join()
+    else:
+        print("[INFO] nothing left to process")
+    elapsed = time.perf_counter() - start
+
+    # throughput of every worker over all of its videos
+    workers = {}
+    for summary in summaries:
+        (frames, seconds) = workers.get(summary["worker"], (0, 0.0))
+        workers[summary["worker"]] = (frames + summary["frames"], seconds + summary["seconds"])
+    for (worker, (frames, seconds)) in sorted(workers.items()):
+        print("[INFO] worker {}: {} frames at {:.1f} FPS".format(worker, frames, frames / max(seconds, 1e-9)))
+
+    totalFrames = sum(summary["frames"] for summary in summaries)
+    print("[INFO] {} videos, {} frames in {:.1f} s ({:.1f} FPS overall)".format(
+        len(summaries), totalFrames, elapsed, totalFrames / max(elapsed, 1e-9)))
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump(dict(videos=sorted(summaries, key=lambda summary: summary["video"]), seconds=elapsed,
+                       frames=totalFrames), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# import the necessary packages
+from concurrent.futures import Future
+from detection_engine import DetectionEngine
+import threading
+import queue
+import time
+
+
+class BatchInferenceService:
+    def __init__(self, engine=None, maxBatch=8, maxDelay=0.01):
+        # collect the frames submitted by any number of callers (several
+        # cameras, or consecutive frames of one video) into batches and
+        # run each batch through the network with a single forward
+        # pass. A batch is sent as soon as it holds maxBatch frames or
+        # maxDelay seconds after its first frame arrived, whichever
+        # comes first, so maxDelay bounds the latency added by waiting
+        self.engine = engine if engine is not None else DetectionEngine()
+        self.maxBatch = maxBatch
+        self.maxDelay = maxDelay
+
+        # number of batches and frames run so far, to compute the
+        # average batch size
+        self.batches = 0
+        self.frames = 0
+
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        # queue a frame for detection, returns a Future resolving to the
+        # (N, 6) detections of DetectionEngine.detect
+        future = Future()
+        self._requests.put((frame, future))
+        return future
+
+    def detect(self, frame):
+        # blocking detection of one frame, for callers without anything
+        # else to do while the batch fills up
+        return self.submit(frame).result()
+
+    def detectMany(self, frames):
+        # submit several frames at once and wait for all of them
+        futures = [self.submit(frame) for frame in frames]
+        return [future.result() for future in futures]
+
+    def close(self):
+        # finish the queued frames and stop the batching thread
+        self._requests.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        # gather up to maxBatch requests, waiting at most maxDelay after
+        # the first one (the requests already queued are always taken).
+        # A None request (close) ends the collection
+        batch = [first]
+        deadline = time.perf_counter() + self.maxDelay
+        while len(batch) < self.maxBatch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    request = self._requests.get(timeout=remaining)
+                else:
+                    request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        closing = False
+        while not closing:
+            request = self._requests.get()
+            if request is None:
+                break
+            (batch, closing) = self._collect(request)
+
+            # frames of different sizes cannot share a blob, run one
+            # forward pass per distinct frame size
+            groups = {}
+            for (frame, future) in batch:
+                groups.setdefault(frame.shape, []).append((frame, future))
+
+            for group in groups.values():
+                frames = [frame for (frame, _) in group]
+                try:
+                    results = self.engine.detectBatch(frames)
+                except Exception as e:
+                    for (_, future) in group:
+                        future.set_exception(e)
+                    continue
+                for ((_, future), result) in zip(group, results):
+                    future.set_result(result)
+                self.batches += 1
+                self.frames += len(frames)
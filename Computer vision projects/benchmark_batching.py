@@ -0,0 +1,61 @@
+import argparse
+import threading
+import time
+import numpy as np
+from batch_inference import BatchInferenceService
+from detection_engine import DetectionEngine
+
+BATCH_SIZES = [1, 2, 4, 8, 16]
+
+
+def stream(service, frames, latencies):
+    # one camera: submit its frames one after the other, like a frame
+    # loop waiting for its detections before moving on
+    for frame in frames:
+        start = time.perf_counter()
+        service.detect(frame)
+        latencies.append(time.perf_counter() - start)
+
+
+def benchmark(engine, batchSize, streams, frames, maxDelay, rng):
+    # run `streams` concurrent cameras through a service batching up to
+    # batchSize frames, returns the throughput and per-frame latencies
+    service = BatchInferenceService(engine, maxBatch=batchSize, maxDelay=maxDelay)
+    video = [rng.integers(0, 255, size=(338, 600, 3), dtype="uint8") for _ in range(frames)]
+    latencies = []
+    threads = [threading.Thread(target=stream, args=(service, video, latencies)) for _ in range(streams)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    service.close()
+
+    latencies = np.array(latencies) * 1000.0
+    return streams * frames / elapsed, latencies, service.frames / max(service.batches, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput vs latency of batched MobileNet-SSD inference")
+    parser.add_argument("--streams", type=int, default=16, help="number of concurrent streams")
+    parser.add_argument("--frames", type=int, default=20, help="frames per stream")
+    parser.add_argument("--delay", type=float, default=0.01, help="max wait for a batch to fill, in seconds")
+    args = parser.parse_args()
+
+    engine = DetectionEngine()
+    rng = np.random.default_rng(42)
+
+    # warm the network up so the first batch size is not penalized
+    engine.detectBatch([rng.integers(0, 255, size=(338, 600, 3), dtype="uint8")])
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>10}".format("batch", "avg batch", "FPS", "p50 (ms)", "p95 (ms)"))
+    for batchSize in BATCH_SIZES:
+        (fps, latencies, average) = benchmark(engine, batchSize, args.streams, args.frames, args.delay, rng)
+        print("{:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            batchSize, average, fps, np.percentile(latencies, 50), np.percentile(latencies, 95)))
+
+
+if __name__ == "__main__":
+    main()
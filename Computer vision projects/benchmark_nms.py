@@ -0,0 +1,109 @@
+import time
+import numpy as np
+from nms import GREEDY_BELOW, nms, batched_nms, soft_nms
+
+BOX_COUNTS = [10, 100, 1000]
+CROSSOVER_COUNTS = [4, 8, 16, 24, 32, 48, 64, 128]
+REPEATS = 50
+FRAME_SIZE = (1920, 1080)
+OVERLAP_THRESH = 0.3
+
+
+def legacy_non_max_suppression(boxes, overlapThresh):
+    # the loop the scripts used before nms.py, kept here as the
+    # reference for speed and for the kept boxes
+    if len(boxes) == 0:
+        return []
+
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
+
+    pick = []
+
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    idxs = np.argsort(y2)
+
+    while len(idxs) > 0:
+        last = len(idxs) - 1
+        i = idxs[last]
+        pick.append(i)
+
+        xx1 = np.maximum(x1[i], x1[idxs[:last]])
+        yy1 = np.maximum(y1[i], y1[idxs[:last]])
+        xx2 = np.minimum(x2[i], x2[idxs[:last]])
+        yy2 = np.minimum(y2[i], y2[idxs[:last]])
+
+        w = np.maximum(0, xx2 - xx1 + 1)
+        h = np.maximum(0, yy2 - yy1 + 1)
+
+        overlap = (w * h) / area[idxs[:last]]
+
+        idxs = np.delete(idxs, np.concatenate(([last],
+                                               np.where(overlap > overlapThresh)[0])))
+
+    return pick
+
+
+def make_detections(count, rng):
+    # detector-like output: a few jittered boxes around each object,
+    # with scores and one of three classes
+    (W, H) = FRAME_SIZE
+    objects = max(count // 4, 1)
+    centers = rng.uniform((0, 0), (W, H), size=(objects, 2))[rng.integers(0, objects, count)]
+    size = rng.uniform(30, 120, size=(count, 2))
+    centers = centers + rng.normal(0, 8, size=(count, 2))
+    boxes = np.hstack([centers - size / 2.0, centers + size / 2.0]).astype("int")
+    scores = rng.uniform(0.3, 1.0, count)
+    classes = rng.integers(0, 3, count)
+    return boxes, scores, classes
+
+
+def timed(function, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return result, np.median(timings) * 1000.0
+
+
+def main():
+    rng = np.random.default_rng(42)
+
+    print("{:>6} {:>12} {:>12} {:>12} {:>12} {:>8} {:>6}".format(
+        "boxes", "legacy (ms)", "nms (ms)", "batched (ms)", "soft (ms)", "speedup", "same"))
+    for count in BOX_COUNTS:
+        (boxes, scores, classes) = make_detections(count, rng)
+
+        (legacy, legacyTime) = timed(legacy_non_max_suppression, boxes, OVERLAP_THRESH)
+        (kept, nmsTime) = timed(nms, boxes, None, OVERLAP_THRESH, "overlap")
+        (_, batchedTime) = timed(batched_nms, boxes, scores, classes, OVERLAP_THRESH)
+        (_, softTime) = timed(soft_nms, boxes, scores)
+
+        same = list(legacy) == kept.tolist()
+        print("{:>6} {:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f} {:>7.1f}x {:>6}".format(
+            count, legacyTime, nmsTime, batchedTime, softTime, legacyTime / nmsTime, str(same)))
+
+    # the greedy loop against the vectorized passes, forced either way,
+    # to place the GREEDY_BELOW threshold of nms
+    print()
+    print("{:>6} {:>12} {:>12}".format("boxes", "greedy (ms)", "vector (ms)"))
+    crossover = None
+    for count in CROSSOVER_COUNTS:
+        (boxes, _, _) = make_detections(count, rng)
+        (_, greedyTime) = timed(nms, boxes, None, OVERLAP_THRESH, "overlap", count + 1)
+        (_, vectorTime) = timed(nms, boxes, None, OVERLAP_THRESH, "overlap", 0)
+        if crossover is None and vectorTime < greedyTime:
+            crossover = count
+        print("{:>6} {:>12.3f} {:>12.3f}".format(count, greedyTime, vectorTime))
+    print("[INFO] vectorized passes faster from {} boxes, GREEDY_BELOW is {}".format(
+        crossover if crossover is not None else "more than {}".format(CROSSOVER_COUNTS[-1]), GREEDY_BELOW))
+
+
+if __name__ == "__main__":
+    main()
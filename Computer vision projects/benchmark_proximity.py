@@ -0,0 +1,85 @@
+import math
+import time
+from itertools import combinations
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from proximity import ProximityEngine
+
+PEOPLE_COUNTS = [10, 50, 200, 1000]
+REPEATS = 20
+FRAME_SIZE = (1920, 1080)
+DISTANCE = 75.0
+
+
+def legacy_red_zone(centroid_dict, distance=DISTANCE):
+    # the loop social_distancing.py used before proximity.py, kept here
+    # as the reference for speed and for the flagged IDs
+    red_zone_list = []
+    for (id1, p1), (id2, p2) in combinations(centroid_dict.items(), 2):
+        dx, dy = p1[0] - p2[0], p1[1] - p2[1]
+        d = math.sqrt(dx * dx + dy * dy)
+        if d < distance:
+            if id1 not in red_zone_list:
+                red_zone_list.append(id1)
+            if id2 not in red_zone_list:
+                red_zone_list.append(id2)
+    return red_zone_list
+
+
+def make_people(count, rng):
+    # people spread over a full HD frame, half of them in small groups
+    (W, H) = FRAME_SIZE
+    groups = rng.uniform((0, 0), (W, H), size=(max(count // 8, 1), 2))
+    grouped = groups[rng.integers(0, len(groups), count // 2)] + rng.normal(0, 40, size=(count // 2, 2))
+    alone = rng.uniform((0, 0), (W, H), size=(count - count // 2, 2))
+    return np.rint(np.vstack([grouped, alone])).astype("int64")
+
+
+def timed(function, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return result, float(np.median(timings) * 1000.0)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    engines = {method: ProximityEngine(DISTANCE, method) for method in ("dense", "grid")}
+
+    print("{:>7} {:>12} {:>12} {:>12} {:>8} {:>10}".format("people", "legacy ms", "dense ms", "grid ms",
+                                                           "flagged", "clusters"))
+    for count in PEOPLE_COUNTS:
+        centroids = make_people(count, rng)
+        centroid_dict = dict(enumerate(centroids.tolist()))
+
+        (legacy, legacyMs) = timed(legacy_red_zone, centroid_dict)
+        results = {}
+        timings = {}
+        for (method, engine) in engines.items():
+            (results[method], timings[method]) = timed(engine.check, centroids)
+
+        # the engines flag the same people as the legacy loop, and their
+        # clusters are the connected components of the close pairs
+        expected = np.zeros(count, dtype=bool)
+        expected[legacy] = True
+        for (method, (pairs, flags, clusters)) in results.items():
+            if not np.array_equal(flags, expected):
+                raise AssertionError("{} flags differ from the legacy loop at {} people".format(method, count))
+            graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(count, count))
+            labels = connected_components(graph, directed=False)[1][flags]
+            combined = len(np.unique(np.column_stack([labels, clusters[flags]]), axis=0))
+            if combined != len(np.unique(labels)) or combined != len(np.unique(clusters[flags])):
+                raise AssertionError("{} clusters differ from the components at {} people".format(method, count))
+        if not np.array_equal(results["dense"][0], results["grid"][0]):
+            raise AssertionError("dense and grid pairs differ at {} people".format(count))
+
+        (_, flags, clusters) = results["dense"]
+        print("{:>7} {:>12.2f} {:>12.2f} {:>12.2f} {:>8} {:>10}".format(
+            count, legacyMs, timings["dense"], timings["grid"], int(flags.sum()), int(clusters.max() + 1)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import time
+import numpy as np
+from centroidtracker import box_iou
+from detection_engine import DetectionEngine
+from threaded_capture import ThreadedCapture
+
+# inference sizes to compare, as (label, DetectionEngine arguments). The
+# first one is the reference the recall of the others is measured with
+RESOLUTIONS = [
+    ("frame", dict()),
+    ("512x288", dict(inputSize=(512, 288))),
+    ("400x225", dict(inputSize=(400, 225))),
+    ("300x300", dict(inputSize="native")),
+    ("300 lbox", dict(inputSize="native", letterbox=True)),
+    ("256x144", dict(inputSize=(256, 144))),
+]
+MATCH_IOU = 0.5
+
+
+def read_frames(path, count, width):
+    cap = ThreadedCapture(path, width=width)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.stop()
+    return frames
+
+
+def recall(detections, reference):
+    # fraction of the reference boxes found again (IoU >= MATCH_IOU)
+    found = 0
+    total = 0
+    for (boxes, expected) in zip(detections, reference):
+        total += len(expected)
+        if len(boxes) > 0 and len(expected) > 0:
+            found += int((box_iou(expected[:, :4], boxes[:, :4]).max(axis=1) >= MATCH_IOU).sum())
+    return found / float(total) if total > 0 else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and recall of MobileNet-SSD per inference size")
+    parser.add_argument("--video", default="test_video.mp4", help="video to profile on")
+    parser.add_argument("--frames", type=int, default=200, help="number of frames to use")
+    parser.add_argument("--width", type=int, default=600, help="width the frames are resized to")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.width)
+    if not frames:
+        raise SystemExit("could not read any frame from {}".format(args.video))
+
+    reference = None
+    print("{:>9} {:>10} {:>10} {:>12} {:>8}".format("size", "mean (ms)", "p95 (ms)", "detections", "recall"))
+    for (label, options) in RESOLUTIONS:
+        engine = DetectionEngine(**options)
+        engine.detect(frames[0])
+
+        timings = []
+        detections = []
+        for frame in frames:
+            start = time.perf_counter()
+            detections.append(engine.detect(frame))
+            timings.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = detections
+        timings = np.array(timings) * 1000.0
+        print("{:>9} {:>10.2f} {:>10.2f} {:>12.2f} {:>8.3f}".format(
+            label, timings.mean(), np.percentile(timings, 95),
+            np.mean([len(boxes) for boxes in detections]), recall(detections, reference)))
+
+
+if __name__ == "__main__":
+    main()
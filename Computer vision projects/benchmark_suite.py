@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+from centroidtracker import CentroidTracker
+from synthetic_scene import generate_scene
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracker_baseline.json")
+
+# a run is flagged as a regression when its median update latency grows
+# by more than this factor, or when it makes more ID switches
+LATENCY_TOLERANCE = 1.25
+
+SCENARIOS = [
+    ("sparse", dict(count=20, speed=3.0)),
+    ("crowd", dict(count=150, speed=3.0)),
+    ("crowd-fast", dict(count=150, speed=10.0)),
+    ("crossings", dict(count=100, speed=4.0, crossing=0.5)),
+    ("occlusion", dict(count=100, speed=3.0, dropout=0.2)),
+    ("stadium", dict(count=1000, speed=2.0, frameSize=(3840, 2160), frames=100)),
+]
+
+TRACKERS = [
+    ("greedy", dict()),
+    ("greedy-grid", dict(gating="grid")),
+    ("hungarian", dict(matching="hungarian")),
+    ("kalman", dict(kalman=True)),
+]
+
+
+def count_id_switches(assignment, ids, rects, objects):
+    # the tracker reports the input box of every object it matched in
+    # this frame, which tells us which ground truth object each tracked
+    # object currently follows -- a ground truth object switches ID
+    # when the tracked object following it changes
+    owner = {tuple(rect): gt for (gt, rect) in zip(ids.tolist(), rects.tolist())}
+    switches = 0
+    for (objectId, bbox) in objects.items():
+        gt = owner.get(tuple(np.asarray(bbox).astype("int").tolist()))
+        if gt is None:
+            continue
+        if gt in assignment and assignment[gt] != objectId:
+            switches += 1
+        assignment[gt] = objectId
+    return switches
+
+
+def run(scene, options):
+    # drive the tracker through the scene, timing every update
+    tracker = CentroidTracker(maxDisappeared=30, maxDistance=60, **options)
+    timings = []
+    assignment = {}
+    switches = 0
+    for (ids, rects) in scene:
+        start = time.perf_counter()
+        tracker.predict()
+        objects = tracker.update(rects)
+        timings.append(time.perf_counter() - start)
+        switches += count_id_switches(assignment, ids, rects, objects)
+
+    # a second pass measures the peak memory, tracemalloc slows the
+    # updates down too much to time them in the same pass
+    tracker = CentroidTracker(maxDisappeared=30, maxDistance=60, **options)
+    tracemalloc.start()
+    for (ids, rects) in scene:
+        tracker.predict()
+        tracker.update(rects)
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.array(timings[1:]) * 1000.0
+    return dict(p50_ms=float(np.percentile(timings, 50)), p95_ms=float(np.percentile(timings, 95)),
+                p99_ms=float(np.percentile(timings, 99)), peak_kb=peak / 1024.0,
+                id_switches=switches, tracks=tracker.nextObjectID, objects=len(assignment))
+
+
+def compare(results, baseline):
+    # report the runs that got slower or made more ID switches than in
+    # the baseline
+    regressions = []
+    for (key, result) in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if result["p50_ms"] > previous["p50_ms"] * LATENCY_TOLERANCE:
+            regressions.append("{}: p50 {:.3f} ms -> {:.3f} ms".format(key, previous["p50_ms"], result["p50_ms"]))
+        if result["id_switches"] > previous["id_switches"]:
+            regressions.append("{}: ID switches {} -> {}".format(key, previous["id_switches"], result["id_switches"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic scene benchmark for CentroidTracker")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare with")
+    parser.add_argument("--save", action="store_true", help="overwrite the baseline with this run")
+    args = parser.parse_args()
+
+    results = {}
+    print("{:>11} {:>12} {:>9} {:>9} {:>9} {:>10} {:>9} {:>7}".format(
+        "scenario", "tracker", "p50 ms", "p95 ms", "p99 ms", "peak KB", "switches", "tracks"))
+    for (scenarioName, scenarioOptions) in SCENARIOS:
+        scene = generate_scene(**scenarioOptions)
+        for (trackerName, trackerOptions) in TRACKERS:
+            result = run(scene, trackerOptions)
+            results["{}/{}".format(scenarioName, trackerName)] = result
+            print("{:>11} {:>12} {:>9.3f} {:>9.3f} {:>9.3f} {:>10.1f} {:>9} {:>7}".format(
+                scenarioName, trackerName, result["p50_ms"], result["p95_ms"], result["p99_ms"],
+                result["peak_kb"], result["id_switches"], result["tracks"]))
+
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        print("regressions: {}".format(len(regressions)))
+        for line in regressions:
+            print("  " + line)
+    else:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("baseline written to {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
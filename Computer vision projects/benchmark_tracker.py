@@ -0,0 +1,62 @@
+import time
+import numpy as np
+from centroidtracker import CentroidTracker
+
+OBJECT_COUNTS = [10, 50, 150, 300, 600, 1000, 2000]
+
+# association modes to compare, as (label, CentroidTracker arguments)
+MODES = [
+    ("greedy", dict()),
+    ("greedy-grid", dict(gating="grid")),
+    ("hungarian", dict(matching="hungarian")),
+    ("hung-grid", dict(matching="hungarian", gating="grid")),
+    ("iou", dict(cost="iou")),
+    ("iou-hung", dict(cost="iou", matching="hungarian")),
+]
+FRAMES = 200
+FRAME_SIZE = (1920, 1080)
+
+
+def make_scene(count, rng):
+    # scatter boxes over the frame and give each one a small velocity
+    (W, H) = FRAME_SIZE
+    centers = rng.uniform((0, 0), (W, H), size=(count, 2))
+    velocity = rng.normal(0, 3, size=(count, 2))
+    return centers, velocity
+
+
+def boxes_from_centers(centers, size=40):
+    half = size / 2.0
+    return np.hstack([centers - half, centers + half]).astype(int)
+
+
+def benchmark(count, options, rng):
+    tracker = CentroidTracker(maxDisappeared=80, maxDistance=90, **options)
+    centers, velocity = make_scene(count, rng)
+
+    timings = []
+    for _ in range(FRAMES):
+        centers = centers + velocity
+        rects = boxes_from_centers(centers)
+
+        start = time.perf_counter()
+        tracker.update(rects)
+        timings.append(time.perf_counter() - start)
+
+    # skip the first frame, it only registers the objects
+    return np.array(timings[1:]) * 1000.0
+
+
+def main():
+    rng = np.random.default_rng(42)
+
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format("objects", "mode", "mean (ms)", "p50 (ms)", "p95 (ms)"))
+    for count in OBJECT_COUNTS:
+        for (label, options) in MODES:
+            timings = benchmark(count, options, rng)
+            print("{:>8} {:>12} {:>12.3f} {:>12.3f} {:>12.3f}".format(
+                count, label, timings.mean(), np.percentile(timings, 50), np.percentile(timings, 95)))
+
+
+if __name__ == "__main__":
+    main()
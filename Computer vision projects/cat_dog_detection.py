@@ -1,40 +1,30 @@
 import cv2
-import numpy as np
 import imutils
+from detection_engine import DetectionEngine
+from class_dispatch import ClassDispatcher
 
-protopath = "MobileNetSSD_deploy.prototxt"
-modelpath = "MobileNetSSD_deploy.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(prototxt=protopath, caffeModel=modelpath)
+# the dogs of the image. The same forward pass can serve more
+# consumers at no extra inference cost: set SHOW_PEOPLE to also draw
+# the people
+SHOW_PEOPLE = False
 
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-           "sofa", "train", "tvmonitor"]
+detector = DetectionEngine(classes=("dog", "person") if SHOW_PEOPLE else ("dog",), nmsThreshold=None)
+dispatcher = ClassDispatcher(detector)
+dispatcher.subscribe("dogs", ("dog",), track=False)
+if SHOW_PEOPLE:
+    dispatcher.subscribe("people", ("person",), track=False)
+
+COLORS = {"dogs": (0, 0, 255), "people": (0, 255, 0)}
 
 
 def main():
     image = cv2.imread('dog.jpg')
     image = imutils.resize(image, width=600)
 
-    (H, W) = image.shape[:2]
-
-    blob = cv2.dnn.blobFromImage(image, 0.007843, (W, H), 127.5)
-
-    detector.setInput(blob)
-    person_detections = detector.forward()
-
-    for i in np.arange(0, person_detections.shape[2]):
-        confidence = person_detections[0, 0, i, 2]
-        if confidence > 0.5:
-            idx = int(person_detections[0, 0, i, 1])
-
-            if CLASSES[idx] != "dog":
-                continue
-
-            person_box = person_detections[0, 0, i, 3:7] * np.array([W, H, W, H])
-            (startX, startY, endX, endY) = person_box.astype("int")
-
-            cv2.rectangle(image, (startX, startY), (endX, endY), (0, 0, 255), 2)
+    detections = dispatcher.detect(image)
+    for (name, rows) in detections.items():
+        for (startX, startY, endX, endY) in rows[:, :4].astype("int").tolist():
+            cv2.rectangle(image, (startX, startY), (endX, endY), COLORS[name], 2)
 
     cv2.imshow("Results", image)
     cv2.waitKey(0)
@@ -1,19 +1,192 @@
 # import the necessary packages
 from scipy.spatial import distance as dist
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from collections import OrderedDict
+from trajectory import TrajectoryStore
 import numpy as np
 
 
+def _greedy_from_best(rowMin, cols, maxDistance):
+    # visit the rows in ascending order of their smallest distance and
+    # give each row its closest column unless an earlier row already
+    # claimed it -- rows whose closest column is farther than the
+    # maximum distance never claim it
+    rows = rowMin.argsort(kind="stable")
+    rows = rows[rowMin[rows] <= maxDistance]
+    cols = cols[rows]
+
+    # the first row (in visiting order) that wants a given column is
+    # the one that gets it
+    cols, first = np.unique(cols, return_index=True)
+    return rows[first], cols
+
+
+def greedy_match(D, maxDistance):
+    # vectorized form of the classic greedy matching on a dense
+    # distance matrix: find the smallest value (and its column) in
+    # each row, then hand out the columns row by row
+    cols = D.argmin(axis=1)
+    rowMin = D[np.arange(D.shape[0]), cols]
+    return _greedy_from_best(rowMin, cols, maxDistance)
+
+
+def greedy_match_sparse(rows, cols, D, numRows, maxDistance):
+    # same matching as greedy_match, but on a sparse list of candidate
+    # (row, col, distance) triplets -- rows without any candidate keep
+    # an infinite distance and are never matched. Among the columns at
+    # the smallest distance the lowest one wins, just like argmin
+    rowMin = np.full(numRows, np.inf)
+    np.minimum.at(rowMin, rows, D)
+    isBest = D == rowMin[rows]
+    best = np.full(numRows, np.iinfo("int64").max)
+    np.minimum.at(best, rows[isBest], cols[isBest])
+    return _greedy_from_best(rowMin, best, maxDistance)
+
+
+def hungarian_match(D, maxDistance):
+    # globally optimal assignment on the gated cost matrix: pairs
+    # beyond the gate get a cost larger than any full set of allowed
+    # pairs, so the solver first maximizes the number of allowed
+    # matches and then minimizes their total cost
+    allowed = D <= maxDistance
+    penalty = (maxDistance + 1.0) * (min(D.shape) + 1)
+    rows, cols = linear_sum_assignment(np.where(allowed, D, penalty))
+    keep = allowed[rows, cols]
+    return rows[keep], cols[keep]
+
+
+def hungarian_match_sparse(rows, cols, D, numRows, maxDistance):
+    # the candidate pairs form a bipartite graph whose connected
+    # components can be solved independently without losing
+    # optimality -- with gating most components are tiny, so this is
+    # far cheaper than one assignment over every row and column
+    if len(rows) == 0:
+        return rows, cols
+
+    numCols = cols.max() + 1
+    graph = coo_matrix((np.ones(len(rows)), (rows, numRows + cols)),
+                       shape=(numRows + numCols, numRows + numCols))
+    (_, labels) = connected_components(graph, directed=False)
+    components = labels[rows]
+
+    # components made of a single candidate pair are matched directly
+    order = components.argsort(kind="stable")
+    (_, starts, counts) = np.unique(components[order], return_index=True, return_counts=True)
+    single = order[starts[counts == 1]]
+    single = single[D[single] <= maxDistance]
+    matchedRows = [rows[single]]
+    matchedCols = [cols[single]]
+
+    # the remaining components are solved one assignment at a time
+    for (start, count) in zip(starts[counts > 1], counts[counts > 1]):
+        pairs = order[start:start + count]
+        usedRows, rowIndex = np.unique(rows[pairs], return_inverse=True)
+        usedCols, colIndex = np.unique(cols[pairs], return_inverse=True)
+        dense = np.full((len(usedRows), len(usedCols)), np.inf)
+        dense[rowIndex, colIndex] = D[pairs]
+        r, c = hungarian_match(dense, maxDistance)
+        matchedRows.append(usedRows[r])
+        matchedCols.append(usedCols[c])
+
+    return np.concatenate(matchedRows), np.concatenate(matchedCols)
+
+
+# the available matching strategies, as (dense, sparse) pairs -- new
+# strategies can be plugged in by adding an entry here
+MATCHERS = {
+    "greedy": (greedy_match, greedy_match_sparse),
+    "hungarian": (hungarian_match, hungarian_match_sparse),
+}
+
+
+def box_iou(boxesA, boxesB):
+    # compute the IoU of every pair of (startX, startY, endX, endY)
+    # boxes in a single broadcast pass
+    boxesA = np.asarray(boxesA, dtype="float64")
+    boxesB = np.asarray(boxesB, dtype="float64")
+    xx1 = np.maximum(boxesA[:, None, 0], boxesB[None, :, 0])
+    yy1 = np.maximum(boxesA[:, None, 1], boxesB[None, :, 1])
+    xx2 = np.minimum(boxesA[:, None, 2], boxesB[None, :, 2])
+    yy2 = np.minimum(boxesA[:, None, 3], boxesB[None, :, 3])
+    inter = np.maximum(0, xx2 - xx1) * np.maximum(0, yy2 - yy1)
+
+    areaA = (boxesA[:, 2] - boxesA[:, 0]) * (boxesA[:, 3] - boxesA[:, 1])
+    areaB = (boxesB[:, 2] - boxesB[:, 0]) * (boxesB[:, 3] - boxesB[:, 1])
+    union = areaA[:, None] + areaB[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def grid_pairs(pointsA, pointsB, cellSize):
+    # bucket both point sets into a uniform grid of square cells and
+    # only score the pairs that fall into neighbouring cells. With the
+    # cell size set to the gating distance every pair closer than that
+    # distance is found, so nothing is lost compared to a full cdist
+    pointsA = np.asarray(pointsA, dtype="float64")
+    pointsB = np.asarray(pointsB, dtype="float64")
+    cellsA = np.floor(pointsA / cellSize).astype("int64")
+    cellsB = np.floor(pointsB / cellSize).astype("int64")
+
+    # shift the cell coordinates so that they (and their neighbours)
+    # are non negative and flatten them into a single integer key
+    low = np.minimum(cellsA.min(axis=0), cellsB.min(axis=0)) - 1
+    span = np.maximum(cellsA.max(axis=0), cellsB.max(axis=0)) - low + 2
+    keysA = (cellsA[:, 0] - low[0]) * span[1] + (cellsA[:, 1] - low[1])
+    keysB = (cellsB[:, 0] - low[0]) * span[1] + (cellsB[:, 1] - low[1])
+
+    # sort the B keys once, then look up the range of B points in each
+    # of the 9 cells around every A point with a binary search
+    order = keysB.argsort(kind="stable")
+    sortedKeys = keysB[order]
+    offsets = np.array([dx * span[1] + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    queries = (keysA[None, :] + offsets[:, None]).ravel()
+    starts = np.searchsorted(sortedKeys, queries, side="left")
+    counts = np.searchsorted(sortedKeys, queries, side="right") - starts
+
+    # expand the ranges into explicit (row, col) candidate pairs
+    total = counts.sum()
+    rows = np.repeat(np.tile(np.arange(len(pointsA)), len(offsets)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = order[np.repeat(starts, counts) + within]
+
+    # score the candidates and drop the ones beyond the gate
+    dx = pointsA[:, 0][rows] - pointsB[:, 0][cols]
+    dy = pointsA[:, 1][rows] - pointsB[:, 1][cols]
+    D = np.sqrt(dx * dx + dy * dy)
+    keep = D <= cellSize
+    return rows[keep], cols[keep], D[keep]
+
+
 class CentroidTracker:
-    def __init__(self, maxDisappeared=50, maxDistance=50):
-        # initialize the next unique object ID along with two ordered
-        # dictionaries used to keep track of mapping a given object
-        # ID to its centroid and number of consecutive frames it has
-        # been marked as "disappeared", respectively
+    def __init__(self, maxDisappeared=50, maxDistance=50, capacity=64, gating="dense",
+                 cost="centroid", matching="greedy", minIoU=0.3, kalman=False,
+                 processNoise=1.0, measurementNoise=10.0, trailLength=0, trailSink=None):
+        # initialize the next unique object ID and the frame counter
         self.nextObjectID = 0
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
-        self.bbox = OrderedDict()  # CHANGE
+        self.frameCount = 0
+        self._predicted = False
+
+        # optionally keep the last trailLength centroids of every
+        # object in a TrajectoryStore -- trails of deregistered objects
+        # are handed to trailSink(objectID, points) if given
+        self.trajectories = None
+        if trailLength > 0:
+            self.trajectories = TrajectoryStore(trailLength, trailSink)
+
+        # the tracker state is kept as a struct of arrays, one slot per
+        # tracked object: the object ID (-1 marks a free slot that can
+        # be reused), its centroid, its bounding box, the number of
+        # consecutive frames it has been marked as "disappeared" and its
+        # constant velocity Kalman state (x, y, vx, vy) and covariance
+        self.capacity = 0
+        self._ids = np.empty(0, dtype="int64")
+        self._centroids = np.empty((0, 2), dtype="float64")
+        self._boxes = np.empty((0, 4), dtype="float64")
+        self._disappeared = np.empty(0, dtype="int64")
+        self._state = np.empty((0, 4), dtype="float64")
+        self._covariance = np.empty((0, 4, 4), dtype="float64")
+        self._grow(capacity)
 
         # store the number of maximum consecutive frames a given
         # object is allowed to be marked as "disappeared" until we
@@ -25,148 +198,309 @@ class CentroidTracker:
         # distance we'll start to mark the object as "disappeared"
         self.maxDistance = maxDistance
 
+        # "dense" scores every (object, input) pair with cdist, "grid"
+        # only scores the pairs in neighbouring cells of a uniform grid
+        # whose cell size is the maximum distance -- both give the same
+        # matches, "grid" is cheaper when there are many objects
+        if gating not in ("dense", "grid"):
+            raise ValueError("unknown gating mode: {}".format(gating))
+        self.gating = gating
+
+        # the association cost is either the "centroid" distance or
+        # one minus the "iou" of the stored and input bounding boxes,
+        # in which case pairs overlapping less than minIoU are never
+        # associated. The pairs are then matched with one of the
+        # MATCHERS: "greedy" (the classic row-min order) or "hungarian"
+        # (globally optimal linear sum assignment)
+        if cost not in ("centroid", "iou"):
+            raise ValueError("unknown association cost: {}".format(cost))
+        if matching not in MATCHERS:
+            raise ValueError("unknown matching strategy: {}".format(matching))
+        self.cost = cost
+        self.matching = matching
+        self.minIoU = minIoU
+
+        # when the Kalman filter is enabled predict() moves every object
+        # along its estimated velocity, which lets the detector skip
+        # frames while the tracker fills the gaps, and update() corrects
+        # the estimates with the matched detections. The noise values
+        # are variances in pixels (per frame for the process noise)
+        self.kalman = kalman
+        self.processNoise = processNoise
+        self.measurementNoise = measurementNoise
+        self._transition = np.array([[1, 0, 1, 0],
+                                     [0, 1, 0, 1],
+                                     [0, 0, 1, 0],
+                                     [0, 0, 0, 1]], dtype="float64")
+        self._processNoise = np.eye(4) * processNoise
+        self._initialCovariance = np.diag([measurementNoise, measurementNoise, 100.0, 100.0])
+
+    def _grow(self, capacity):
+        # enlarge the preallocated arrays, the new slots start free
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype="int64")])
+        self._centroids = np.concatenate([self._centroids, np.zeros((extra, 2), dtype="float64")])
+        self._boxes = np.concatenate([self._boxes, np.zeros((extra, 4), dtype="float64")])
+        self._disappeared = np.concatenate([self._disappeared, np.zeros(extra, dtype="int64")])
+        self._state = np.concatenate([self._state, np.zeros((extra, 4), dtype="float64")])
+        self._covariance = np.concatenate([self._covariance, np.zeros((extra, 4, 4), dtype="float64")])
+        self.capacity = capacity
+
+        if self.trajectories is not None:
+            self.trajectories.grow(capacity)
+
+    def _activeSlots(self):
+        # grab the occupied slots ordered by object ID, which is the
+        # order the objects were registered in
+        slots = np.flatnonzero(self._ids >= 0)
+        return slots[self._ids[slots].argsort(kind="stable")]
+
+    def _registerMany(self, centroids, rects):
+        # claim a free slot for every new object, doubling the
+        # capacity whenever we run out of free slots
+        count = len(centroids)
+        free = np.flatnonzero(self._ids < 0)
+        if len(free) < count:
+            capacity = max(self.capacity, 1)
+            while capacity - self.capacity + len(free) < count:
+                capacity *= 2
+            self._grow(capacity)
+            free = np.flatnonzero(self._ids < 0)
+
+        slots = free[:count]
+        self._ids[slots] = np.arange(self.nextObjectID, self.nextObjectID + count)
+        self._centroids[slots] = centroids
+        self._boxes[slots] = rects
+        self._disappeared[slots] = 0
+        self._state[slots, :2] = centroids
+        self._state[slots, 2:] = 0
+        self._covariance[slots] = self._initialCovariance
+        self.nextObjectID += count
+
+        if self.trajectories is not None:
+            self.trajectories.reset(slots)
+        return slots
+
+    def _deregisterMany(self, slots):
+        # releasing a slot only requires clearing its object ID (and
+        # evicting its trail)
+        if self.trajectories is not None:
+            self.trajectories.evict(slots, self._ids[slots])
+        self._ids[slots] = -1
+
+    def _markDisappeared(self, slots):
+        # increment the disappeared counter of the given slots and
+        # deregister the objects that have been missing for too long
+        self._disappeared[slots] += 1
+        self._deregisterMany(slots[self._disappeared[slots] > self.maxDisappeared])
+
+    def _correct(self, slots, centroids):
+        # Kalman measurement update of the given slots with the matched
+        # input centroids, done for all of them at once
+        P = self._covariance[slots]
+        S = P[:, :2, :2] + np.eye(2) * self.measurementNoise
+        K = P[:, :, :2] @ np.linalg.inv(S)
+        innovation = centroids - self._state[slots, :2]
+        self._state[slots] += (K @ innovation[:, :, None])[:, :, 0]
+        self._covariance[slots] = P - K @ P[:, :2, :]
+        return self._state[slots, :2]
+
     def register(self, centroid, inputRect):
         # when registering an object we use the next available object
         # ID to store the centroid
-        self.objects[self.nextObjectID] = centroid
-        self.bbox[self.nextObjectID] = inputRect  # CHANGE
-        self.disappeared[self.nextObjectID] = 0
-        self.nextObjectID += 1
+        self._registerMany(np.asarray(centroid).reshape(1, 2),
+                           np.asarray(inputRect, dtype="float64").reshape(1, 4))
 
     def deregister(self, objectID):
-        # to deregister an object ID we delete the object ID from
-        # both of our respective dictionaries
-        del self.objects[objectID]
-        del self.disappeared[objectID]
-        del self.bbox[objectID]  # CHANGE
+        # to deregister an object ID we free the slot holding it
+        self._deregisterMany(np.flatnonzero(self._ids == objectID))
+
+    def _recordTrails(self):
+        # append the current centroid of every object to its trail
+        if self.trajectories is not None:
+            slots = self._activeSlots()
+            self.trajectories.push(slots, self._centroids[slots], self.frameCount)
+
+    def drawTrails(self, frame, color=(0, 255, 0), thickness=2):
+        # draw the trails of the tracked objects onto the frame
+        if self.trajectories is not None:
+            self.trajectories.draw(frame, self._activeSlots(), color, thickness)
+        return frame
+
+    def getState(self):
+        # return copies of the settings, counters and arrays needed to
+        # rebuild this tracker, e.g. to checkpoint it to disk
+        config = dict(maxDisappeared=self.maxDisappeared, maxDistance=self.maxDistance,
+                      gating=self.gating, cost=self.cost, matching=self.matching,
+                      minIoU=self.minIoU, kalman=self.kalman, processNoise=self.processNoise,
+                      measurementNoise=self.measurementNoise,
+                      trailLength=0 if self.trajectories is None else self.trajectories.length)
+        counters = dict(nextObjectID=self.nextObjectID, frameCount=self.frameCount,
+                        predicted=self._predicted)
+        arrays = dict(ids=self._ids, centroids=self._centroids, boxes=self._boxes,
+                      disappeared=self._disappeared, state=self._state,
+                      covariance=self._covariance)
+        if self.trajectories is not None:
+            arrays.update(trailPoints=self.trajectories._points, trailHead=self.trajectories._head,
+                          trailCount=self.trajectories._count,
+                          trailLastFrame=self.trajectories._lastFrame)
+
+        arrays = {name: array.copy() for (name, array) in arrays.items()}
+        return config, counters, arrays
+
+    def setState(self, counters, arrays):
+        # restore the counters and arrays produced by getState() -- the
+        # tracker must have been built with the same settings
+        self.nextObjectID = int(counters["nextObjectID"])
+        self.frameCount = int(counters["frameCount"])
+        self._predicted = bool(counters["predicted"])
+
+        self.capacity = len(arrays["ids"])
+        self._ids = np.array(arrays["ids"], dtype="int64")
+        self._centroids = np.array(arrays["centroids"], dtype="float64")
+        self._boxes = np.array(arrays["boxes"], dtype="float64")
+        self._disappeared = np.array(arrays["disappeared"], dtype="int64")
+        self._state = np.array(arrays["state"], dtype="float64")
+        self._covariance = np.array(arrays["covariance"], dtype="float64")
+
+        if self.trajectories is not None:
+            store = self.trajectories
+            store.capacity = self.capacity
+            if "trailPoints" in arrays:
+                store._points = np.array(arrays["trailPoints"], dtype="float32")
+                store._head = np.array(arrays["trailHead"], dtype="int64")
+                store._count = np.array(arrays["trailCount"], dtype="int64")
+                store._lastFrame = np.array(arrays["trailLastFrame"], dtype="int64")
+            else:
+                store._points = np.zeros((self.capacity, store.length, 2), dtype="float32")
+                store._head = np.zeros(self.capacity, dtype="int64")
+                store._count = np.zeros(self.capacity, dtype="int64")
+                store._lastFrame = np.full(self.capacity, -1, dtype="int64")
+
+    def tracks(self):
+        # return the IDs, centroids and bounding boxes of the tracked
+        # objects as arrays, for callers that want to stay vectorized
+        slots = self._activeSlots()
+        return self._ids[slots], self._centroids[slots], self._boxes[slots]
+
+    # the dictionary views below are kept for backward compatibility,
+    # they are rebuilt from the arrays on every access
+    @property
+    def objects(self):
+        slots = self._activeSlots()
+        return OrderedDict(zip(self._ids[slots].tolist(), self._centroids[slots].astype("int64")))
+
+    @property
+    def disappeared(self):
+        slots = self._activeSlots()
+        return OrderedDict(zip(self._ids[slots].tolist(), self._disappeared[slots].tolist()))
+
+    @property
+    def bbox(self):
+        slots = self._activeSlots()
+        return OrderedDict(zip(self._ids[slots].tolist(), self._boxes[slots]))
+
+    def _associate(self, slots, inputCentroids, inputRects):
+        # match the tracked objects (rows) to the inputs (columns) and
+        # return the matched row and column indexes
+        (match, matchSparse) = MATCHERS[self.matching]
+
+        if self.cost == "iou":
+            D = 1.0 - box_iou(self._boxes[slots], inputRects)
+            return match(D, 1.0 - self.minIoU)
+
+        objectCentroids = self._centroids[slots]
+        if self.gating == "grid" and self.maxDistance > 0:
+            rows, cols, D = grid_pairs(objectCentroids, inputCentroids, self.maxDistance)
+            return matchSparse(rows, cols, D, len(slots), self.maxDistance)
+
+        D = dist.cdist(objectCentroids, inputCentroids)
+        return match(D, self.maxDistance)
+
+    def predict(self):
+        # advance every tracked object by one frame without any
+        # detections -- call it once per frame, before update() on the
+        # frames the detector runs on. Without the Kalman filter the
+        # objects simply stay where they are
+        self.frameCount += 1
+        self._predicted = True
+
+        slots = self._activeSlots()
+        if self.kalman and len(slots) > 0:
+            F = self._transition
+            state = self._state[slots] @ F.T
+            shift = state[:, :2] - self._state[slots, :2]
+            self._state[slots] = state
+            self._covariance[slots] = F @ self._covariance[slots] @ F.T + self._processNoise
+            self._centroids[slots] = state[:, :2]
+            self._boxes[slots] += np.hstack([shift, shift])
+
+        self._recordTrails()
+        return self.bbox
 
     def update(self, rects):
+        # every update() starts a new frame unless predict() already
+        # did so for this frame
+        if not self._predicted:
+            self.frameCount += 1
+        self._predicted = False
+
+        # grab the occupied slots of the objects we are tracking
+        slots = self._activeSlots()
+
         # check to see if the list of input bounding box rectangles
         # is empty
         if len(rects) == 0:
-            # loop over any existing tracked objects and mark them
-            # as disappeared
-            for objectID in list(self.disappeared.keys()):
-                self.disappeared[objectID] += 1
-
-                # if we have reached a maximum number of consecutive
-                # frames where a given object has been marked as
-                # missing, deregister it
-                if self.disappeared[objectID] > self.maxDisappeared:
-                    self.deregister(objectID)
+            # mark every existing tracked object as disappeared
+            self._markDisappeared(slots)
 
             # return early as there are no centroids or tracking info
             # to update
-            # return self.objects
+            self._recordTrails()
             return self.bbox
 
-        # initialize an array of input centroids for the current frame
-        inputCentroids = np.zeros((len(rects), 2), dtype="int")
-        inputRects = []
-        # loop over the bounding box rectangles
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            # use the bounding box coordinates to derive the centroid
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            inputCentroids[i] = (cX, cY)
-            inputRects.append(rects[i])  # CHANGE
+        # derive the input centroids for the current frame from the
+        # bounding box coordinates
+        inputRects = np.asarray(rects, dtype="float64").reshape(-1, 4)
+        inputCentroids = ((inputRects[:, :2] + inputRects[:, 2:]) / 2.0).astype("int64")
 
         # if we are currently not tracking any objects take the input
         # centroids and register each of them
-        if len(self.objects) == 0:
-            for i in range(0, len(inputCentroids)):
-                self.register(inputCentroids[i], inputRects[i])  # CHANGE
+        if len(slots) == 0:
+            self._registerMany(inputCentroids, inputRects)
+            self._recordTrails()
+            return self.bbox
+
+        # otherwise, we are currently tracking objects so we need to
+        # match the input centroids to existing object centroids
+        rows, cols = self._associate(slots, inputCentroids, inputRects)
 
-        # otherwise, are are currently tracking objects so we need to
-        # try to match the input centroids to existing object
-        # centroids
+        # update the matched objects and reset their disappeared
+        # counters
+        matched = slots[rows]
+        if self.kalman:
+            self._centroids[matched] = self._correct(matched, inputCentroids[cols])
         else:
-            # grab the set of object IDs and corresponding centroids
-            objectIDs = list(self.objects.keys())
-            objectCentroids = list(self.objects.values())
-
-            # compute the distance between each pair of object
-            # centroids and input centroids, respectively -- our
-            # goal will be to match an input centroid to an existing
-            # object centroid
-            D = dist.cdist(np.array(objectCentroids), inputCentroids)
-
-            # in order to perform this matching we must (1) find the
-            # smallest value in each row and then (2) sort the row
-            # indexes based on their minimum values so that the row
-            # with the smallest value as at the *front* of the index
-            # list
-            rows = D.min(axis=1).argsort()
-
-            # next, we perform a similar process on the columns by
-            # finding the smallest value in each column and then
-            # sorting using the previously computed row index list
-            cols = D.argmin(axis=1)[rows]
-
-            # in order to determine if we need to update, register,
-            # or deregister an object we need to keep track of which
-            # of the rows and column indexes we have already examined
-            usedRows = set()
-            usedCols = set()
-
-            # loop over the combination of the (row, column) index
-            # tuples
-            for (row, col) in zip(rows, cols):
-                # if we have already examined either the row or
-                # column value before, ignore it
-                if row in usedRows or col in usedCols:
-                    continue
-
-                # if the distance between centroids is greater than
-                # the maximum distance, do not associate the two
-                # centroids to the same object
-                if D[row, col] > self.maxDistance:
-                    continue
-
-                # otherwise, grab the object ID for the current row,
-                # set its new centroid, and reset the disappeared
-                # counter
-                objectID = objectIDs[row]
-                self.objects[objectID] = inputCentroids[col]
-                self.bbox[objectID] = inputRects[col]  # CHANGE
-                self.disappeared[objectID] = 0
-
-                # indicate that we have examined each of the row and
-                # column indexes, respectively
-                usedRows.add(row)
-                usedCols.add(col)
-
-            # compute both the row and column index we have NOT yet
-            # examined
-            unusedRows = set(range(0, D.shape[0])).difference(usedRows)
-            unusedCols = set(range(0, D.shape[1])).difference(usedCols)
-
-            # in the event that the number of object centroids is
-            # equal or greater than the number of input centroids
-            # we need to check and see if some of these objects have
-            # potentially disappeared
-            if D.shape[0] >= D.shape[1]:
-                # loop over the unused row indexes
-                for row in unusedRows:
-                    # grab the object ID for the corresponding row
-                    # index and increment the disappeared counter
-                    objectID = objectIDs[row]
-                    self.disappeared[objectID] += 1
-
-                    # check to see if the number of consecutive
-                    # frames the object has been marked "disappeared"
-                    # for warrants deregistering the object
-                    if self.disappeared[objectID] > self.maxDisappeared:
-                        self.deregister(objectID)
-
-            # otherwise, if the number of input centroids is greater
-            # than the number of existing object centroids we need to
-            # register each new input centroid as a trackable object
-            else:
-                for col in unusedCols:
-                    self.register(inputCentroids[col], inputRects[col])
+            self._centroids[matched] = inputCentroids[cols]
+        self._boxes[matched] = inputRects[cols]
+        self._disappeared[matched] = 0
+
+        # in the event that the number of object centroids is equal or
+        # greater than the number of input centroids the unmatched
+        # objects have potentially disappeared, otherwise we register
+        # every unmatched input centroid as a new trackable object
+        if len(slots) >= len(inputCentroids):
+            unusedRows = np.ones(len(slots), dtype=bool)
+            unusedRows[rows] = False
+            self._markDisappeared(slots[unusedRows])
+        else:
+            unusedCols = np.ones(len(inputCentroids), dtype=bool)
+            unusedCols[cols] = False
+            self._registerMany(inputCentroids[unusedCols], inputRects[unusedCols])
 
         # return the set of trackable objects
-        # return self.objects
+        self._recordTrails()
         return self.bbox
-
@@ -0,0 +1,220 @@
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import time
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from centroidtracker import CentroidTracker, box_iou
+from detection_engine import DetectionEngine
+from inference_backends import set_threads
+from tracking_loop import open_capture, tracker_options
+
+# the detector of a worker process
+_detector = None
+
+
+def plan_chunks(frameCount, chunks, overlap):
+    # split [0, frameCount) into `chunks` time ranges. Every chunk but
+    # the first starts tracking `overlap` frames early, so its tracker
+    # is warmed up when its own range begins and its tracks can be
+    # matched with the ones of the previous chunk over those frames.
+    # Returns (warmStart, start, stop) triples
+    bounds = np.round(np.linspace(0, frameCount, chunks + 1)).astype("int")
+    return [(max(int(start) - overlap, 0), int(start), int(stop))
+            for (start, stop) in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _init_worker(engineOptions):
+    global _detector
+    set_threads(1)
+    _detector = DetectionEngine(**engineOptions)
+
+
+def track_chunk(job):
+    # detect and track the frames [warmStart, stop) of a video with a
+    # fresh tracker, returns the tracked boxes of every frame as flat
+    # arrays: frame index, local object ID and box
+    (path, warmStart, start, stop, width, interval) = job
+    cap = open_capture(path, _detector, width, startFrame=warmStart)
+    tracker = CentroidTracker(**tracker_options(interval, maxDisappeared=80, maxDistance=90))
+
+    (frames, ids, boxes) = ([], [], [])
+    began = time.perf_counter()
+    for index in range(warmStart, stop):
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        tracker.predict()
+        if index % interval == 0:
+            tracker.update(_detector.detect(frame)[:, :4].astype("int"))
+
+        (objectIDs, _, objectBoxes) = tracker.tracks()
+        frames.append(np.full(len(objectIDs), index, dtype="int64"))
+        ids.append(objectIDs.astype("int64"))
+        boxes.append(objectBoxes.astype("int64").reshape(-1, 4))
+    cap.stop()
+
+    return dict(warmStart=warmStart, start=start, stop=stop, seconds=time.perf_counter() - began,
+                frames=np.concatenate(frames or [np.empty(0, dtype="int64")]),
+                ids=np.concatenate(ids or [np.empty(0, dtype="int64")]),
+                boxes=np.vstack(boxes or [np.empty((0, 4), dtype="int64")]))
+
+
+def match_overlap(previous, current, window, minIoU=0.5):
+    # match the IDs of two chunks over the frames both of them tracked:
+    # a pair of IDs gets a vote on every frame where their boxes agree,
+    # and the IDs are paired to maximize the votes. A pair needs the
+    # votes of at least half the frames the current ID was seen on.
+    # Returns {current ID: previous ID}
+    (low, high) = window
+    a = (previous["frames"] >= low) & (previous["frames"] < high)
+    b = (current["frames"] >= low) & (current["frames"] < high)
+    if not a.any() or not b.any():
+        return {}
+
+    (idsA, rowsA) = np.unique(previous["ids"][a], return_inverse=True)
+    (idsB, rowsB) = np.unique(current["ids"][b], return_inverse=True)
+    (framesA, boxesA) = (previous["frames"][a], previous["boxes"][a])
+    (framesB, boxesB) = (current["frames"][b], current["boxes"][b])
+
+    votes = np.zeros((len(idsA), len(idsB)), dtype="int64")
+    for frame in np.intersect1d(framesA, framesB):
+        inA = framesA == frame
+        inB = framesB == frame
+        agree = box_iou(boxesA[inA], boxesB[inB]) >= minIoU
+        (i, j) = np.nonzero(agree)
+        np.add.at(votes, (rowsA[inA][i], rowsB[inB][j]), 1)
+
+    (rows, cols) = linear_sum_assignment(-votes)
+    seen = np.bincount(rowsB, minlength=len(idsB))
+    keep = votes[rows, cols] * 2 >= np.maximum(seen[cols], 1)
+    return dict(zip(idsB[cols[keep]].tolist(), idsA[rows[keep]].tolist()))
+
+
+def stitch(chunks, minIoU=0.5):
+    # give the tracks of consecutive chunks global IDs: the tracks found
+    # again across a boundary keep the ID of the previous chunk, the
+    # others get new IDs in order of appearance, like a single tracker
+    # would hand them out. Every chunk contributes the frames of its own
+    # range only. Returns the frame indexes, global IDs and boxes
+    nextObjectID = 0
+    previous = None
+    (frames, ids, boxes) = ([], [], [])
+    for chunk in sorted(chunks, key=lambda chunk: chunk["start"]):
+        matches = {}
+        if previous is not None:
+            matches = match_overlap(previous, chunk, (chunk["warmStart"], chunk["start"]), minIoU)
+
+        own = chunk["frames"] >= chunk["start"]
+        local = chunk["ids"][own]
+        labels = dict(matches)
+        for objectID in local[np.sort(np.unique(local, return_index=True)[1])].tolist():
+            if objectID not in labels:
+                labels[objectID] = nextObjectID
+                nextObjectID += 1
+
+        globalIDs = np.array([labels[objectID] for objectID in local.tolist()], dtype="int64")
+        frames.append(chunk["frames"][own])
+        ids.append(globalIDs)
+        boxes.append(chunk["boxes"][own])
+        previous = dict(frames=chunk["frames"][own], ids=globalIDs, boxes=chunk["boxes"][own])
+
+    return (np.concatenate(frames or [np.empty(0, dtype="int64")]), np.concatenate(ids or [np.empty(0, dtype="int64")]),
+            np.vstack(boxes or [np.empty((0, 4), dtype="int64")]))
+
+
+def dwell_times(frames, ids, fps):
+    # first frame, last frame and dwell time in seconds of every ID
+    (unique, inverse) = np.unique(ids, return_inverse=True)
+    first = np.full(len(unique), np.iinfo("int64").max)
+    last = np.full(len(unique), -1)
+    np.minimum.at(first, inverse, frames)
+    np.maximum.at(last, inverse, frames)
+    return unique, first, last, (last - first + 1) / float(fps)
+
+
+def run(path, workers, chunks, overlap, width, interval, engineOptions):
+    capture = cv2.VideoCapture(path)
+    frameCount = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    capture.release()
+
+    # a video that cannot be opened (or reports no frames) has no chunk
+    # to track, and a pool of no workers cannot be created
+    jobs = [(path, warmStart, start, stop, width, interval)
+            for (warmStart, start, stop) in plan_chunks(frameCount, chunks, overlap)]
+    if not jobs:
+        return [], fps
+    with mp.Pool(min(workers, len(jobs)), initializer=_init_worker, initargs=(engineOptions,)) as pool:
+        results = pool.map(track_chunk, jobs)
+    return results, fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track one long video in parallel time chunks")
+    parser.add_argument("video", help="video to process")
+    parser.add_argument("-o", "--output", default="chunked_output", help="directory to write the results to")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--chunks", type=int, default=None, help="number of chunks (default: one per worker)")
+    parser.add_argument("--overlap", type=int, default=100, help="frames tracked by both sides of a boundary")
+    parser.add_argument("--width", type=int, default=600, help="width the frames are resized to")
+    parser.add_argument("--interval", type=int, default=1, help="run the detector every Nth frame")
+    parser.add_argument("--confidence", type=float, default=0.5, help="minimum detection score")
+    parser.add_argument("--backend", default=None, help="inference backend name, or auto")
+    parser.add_argument("--compare", action="store_true", help="also track sequentially and compare")
+    args = parser.parse_args()
+
+    engineOptions = dict(confidence=args.confidence, backend=args.backend)
+    if mp.get_start_method() == "fork":
+        DetectionEngine(**engineOptions)
+
+    start = time.perf_counter()
+    (results, fps) = run(args.video, args.workers, args.chunks or args.workers, args.overlap,
+                         args.width, args.interval, engineOptions)
+    (frames, ids, boxes) = stitch(results)
+    elapsed = time.perf_counter() - start
+    (objectIDs, first, last, dwell) = dwell_times(frames, ids, fps)
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "tracks.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "objectID", "startX", "startY", "endX", "endY"])
+        writer.writerows(np.column_stack([frames, ids, boxes]).tolist())
+    with open(os.path.join(args.output, "dwell.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["objectID", "firstFrame", "lastFrame", "seconds"])
+        writer.writerows(zip(objectIDs.tolist(), first.tolist(), last.tolist(), np.round(dwell, 3).tolist()))
+
+    summary = dict(video=args.video, chunks=len(results), frames=int(frames.max() + 1) if len(frames) else 0,
+                   people=len(objectIDs), mean_dwell=float(dwell.mean()) if len(dwell) else 0.0,
+                   seconds=elapsed, chunk_seconds=[result["seconds"] for result in results])
+    print("[INFO] {} chunks: {} people, {:.1f} s".format(len(results), summary["people"], elapsed))
+
+    if args.compare:
+        # the same video with one chunk, i.e. a sequential run
+        start = time.perf_counter()
+        (sequential, _) = run(args.video, 1, 1, 0, args.width, args.interval, engineOptions)
+        (seqFrames, seqIDs, seqBoxes) = stitch(sequential)
+        seqElapsed = time.perf_counter() - start
+
+        # a row agrees when the sequential run tracked the same box on
+        # the same frame under the same ID
+        reference = {(frame, tuple(box)): objectID for (frame, objectID, box)
+                     in zip(seqFrames.tolist(), seqIDs.tolist(), seqBoxes.tolist())}
+        agreement = np.mean([reference.get((frame, tuple(box))) == objectID for (frame, objectID, box)
+                             in zip(frames.tolist(), ids.tolist(), boxes.tolist())]) if len(frames) else 1.0
+        summary.update(sequential_people=len(np.unique(seqIDs)), sequential_seconds=seqElapsed,
+                       id_agreement=agreement)
+        print("[INFO] sequential: {} people, {:.1f} s (speedup {:.2f}x), {:.2%} of the rows with the same ID".format(
+            summary["sequential_people"], seqElapsed, seqElapsed / elapsed, agreement))
+
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# import the necessary packages
+from centroidtracker import CentroidTracker
+from detection_engine import CLASSES, class_thresholds
+from tracking_loop import tracker_options
+import numpy as np
+
+
+class Subscription:
+    def __init__(self, name, classes, tracker=None, confidence=None):
+        # a consumer of the detections of some classes: the class IDs it
+        # wants, an optional stricter score threshold (one value or a
+        # {class name: threshold} dict) and its own tracker, so the
+        # object IDs of people, pets and vehicles never mix
+        self.name = name
+        self.classes = tuple(classes)
+        self.classIDs = np.array([CLASSES.index(c) for c in self.classes], dtype="int64")
+        self.thresholds = None if confidence is None else class_thresholds(confidence, 0.0)
+        self.tracker = tracker
+
+    def select(self, detections):
+        # the rows of an (N, 6) detection array meant for this consumer
+        classIDs = detections[:, 5].astype("int64")
+        keep = np.isin(classIDs, self.classIDs)
+        if self.thresholds is not None:
+            keep &= detections[:, 4] > self.thresholds[classIDs]
+        return detections[keep]
+
+
+class ClassDispatcher:
+    def __init__(self, detector, interval=1):
+        # split the detections of one forward pass over all classes
+        # between the subscribed consumers. Every consumer gets its own
+        # tracker partition. The detector must keep every subscribed
+        # class (build it with classes=self.classes(), or None), its
+        # confidence may be a per class dict. The detector runs every
+        # `interval` frames, the trackers predict in between
+        self.detector = detector
+        self.interval = interval
+        self.subscriptions = {}
+
+    def subscribe(self, name, classes, trackerOptions=None, confidence=None, track=True):
+        # register a consumer of `classes` and return its Subscription,
+        # with a tracker built from trackerOptions unless track is False
+        # (with the Kalman filter of tracker_options by default)
+        if name in self.subscriptions:
+            raise ValueError("already subscribed: {}".format(name))
+        tracker = CentroidTracker(**tracker_options(self.interval, **(trackerOptions or {}))) if track else None
+        subscription = Subscription(name, classes, tracker, confidence)
+        self.subscriptions[name] = subscription
+        return subscription
+
+    def classes(self):
+        # every class some consumer subscribed to
+        return sorted(set(c for subscription in self.subscriptions.values() for c in subscription.classes),
+                      key=CLASSES.index)
+
+    def dispatch(self, detections):
+        # {subscription name: its detections}
+        return {name: subscription.select(detections) for (name, subscription) in self.subscriptions.items()}
+
+    def detect(self, frame):
+        # one forward pass, split per consumer, or None when the
+        # detector skipped the frame (see GatedDetector)
+        detections = self.detector.detect(frame)
+        return None if detections is None else self.dispatch(detections)
+
+    def process(self, frame, index):
+        # detect (every `interval` frames) and track one frame, returns
+        # {subscription name: (ids, centroids, boxes)} for the consumers
+        # with a tracker
+        detections = None
+        if index % self.interval == 0:
+            detections = self.detect(frame)
+
+        tracks = {}
+        for (name, subscription) in self.subscriptions.items():
+            if subscription.tracker is None:
+                continue
+            subscription.tracker.predict()
+            if detections is not None:
+                subscription.tracker.update(detections[name][:, :4].astype("int"))
+            tracks[name] = subscription.tracker.tracks()
+        return tracks
@@ -0,0 +1,231 @@
+# import the necessary packages
+import cv2
+import numpy as np
+from nms import batched_nms
+from model_manager import MODELS
+from inference_backends import OpenCVBackend, create_backend, tuned_backend
+
+PROTOTXT_PATH = "MobileNetSSD_deploy.prototxt"
+MODEL_PATH = "MobileNetSSD_deploy.caffemodel"
+
+FACE_PROTOTXT_PATH = "deploy.prototxt"
+FACE_MODEL_PATH = "res10_300x300_ssd_iter_140000.caffemodel"
+
+CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
+           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
+           "sofa", "train", "tvmonitor"]
+
+# default score threshold, also used for the classes a per class
+# confidence dict leaves out
+DEFAULT_CONFIDENCE = 0.5
+
+
+def load_net(protopath=PROTOTXT_PATH, modelpath=MODEL_PATH, onnxpath=None, warmupSize=(300, 300)):
+    # parse the model once per process, later calls reuse the same net,
+    # and warm it up at warmupSize (once per size)
+    return MODELS.load(protopath, modelpath, onnxpath, warmupSize)
+
+
+def class_thresholds(confidence, default=DEFAULT_CONFIDENCE, classes=CLASSES):
+    # per class score thresholds, as an array indexed by class ID, from
+    # either a single threshold or a {class name: threshold} dict --
+    # the classes the dict leaves out get the default
+    if np.ndim(confidence) == 0 and not isinstance(confidence, dict):
+        return np.full(len(classes), float(confidence))
+
+    thresholds = np.full(len(classes), float(default))
+    for (name, threshold) in confidence.items():
+        thresholds[classes.index(name)] = threshold
+    return thresholds
+
+
+def decode_detections(detections, W, H, confidence=DEFAULT_CONFIDENCE, classIDs=None):
+    # turn the raw SSD output -- rows of (image, class, score, startX,
+    # startY, endX, endY) with coordinates relative to the image --
+    # into an (N, 6) array of (startX, startY, endX, endY, score,
+    # class) in pixels, filtering by score and class with masks
+    # instead of walking the rows in Python. confidence is either one
+    # threshold or an array of thresholds indexed by class ID
+    rows = detections.reshape(-1, 7)
+    if np.ndim(confidence) == 0:
+        keep = rows[:, 2] > confidence
+    else:
+        keep = rows[:, 2] > np.asarray(confidence)[rows[:, 1].astype("int")]
+    if classIDs is not None:
+        keep &= np.isin(rows[:, 1].astype("int"), classIDs)
+
+    rows = rows[keep].astype("float64")
+    boxes = rows[:, 3:7] * np.array([W, H, W, H])
+    return np.column_stack([boxes, rows[:, 2], rows[:, 1]])
+
+
+class DetectionEngine:
+    # input preprocessing of the network: pixel scale, mean to subtract,
+    # default input size (None runs the network at the size of the
+    # frame) and the size the network was trained at
+    SCALE = 0.007843
+    MEAN = 127.5
+    SIZE = None
+    NATIVE_SIZE = (300, 300)
+
+    def __init__(self, protopath=PROTOTXT_PATH, modelpath=MODEL_PATH, confidence=DEFAULT_CONFIDENCE,
+                 classes=("person",), nmsThreshold=0.3, backend=None, target=None,
+                 inputSize=None, letterbox=False, onnxpath=None, threads=None, frameSize=None):
+        # one MobileNet-SSD detector shared by all the analytics scripts:
+        # the net is loaded once per process, the output is decoded with
+        # vectorized masks and the boxes go through NMS. Set classes to
+        # None to keep every class, nmsThreshold to None to skip NMS.
+        # confidence is one score threshold, or a {class name:
+        # threshold} dict whose missing classes use DEFAULT_CONFIDENCE,
+        # so a single forward pass can serve several classes each with
+        # its own threshold (see class_dispatch.ClassDispatcher).
+        # inputSize is the (width, height) the network runs at: None for
+        # the default, "native" for the size the network was trained at.
+        # The frame is stretched to it, or scaled and padded to keep its
+        # aspect ratio with letterbox. Boxes always come back in frame
+        # coordinates. onnxpath optionally names an ONNX export of the
+        # model, loaded instead of the Caffe files when it exists.
+        # backend is either a cv2.dnn backend constant (with target), or
+        # the name of one of inference_backends.BACKENDS, or "auto" for
+        # the fastest backend of this host (benchmarked on the first run
+        # at the input size the network really runs at -- the size of
+        # the first frame when it runs at frame size -- and remembered
+        # per size). threads sets the number of threads of an ONNX
+        # Runtime backend; the OpenCV thread pool is process wide, set
+        # it once per process with inference_backends.set_threads
+        self.inputSize = self.NATIVE_SIZE if inputSize == "native" else inputSize
+        self.letterbox = letterbox
+
+        # the backend is built (and warmed up) at the input size the
+        # network really runs at. When it runs at the size of the frames
+        # and frameSize (the (W, H) of the frames) is not given, that
+        # size is only known from warmup() or the first forward pass --
+        # the net is still parsed right away, so it can be shared with
+        # forked workers
+        self.runtime = None
+        if backend == "auto":
+            self._createRuntime = lambda size, warm: tuned_backend(protopath, modelpath, onnxpath, size)
+        elif isinstance(backend, str):
+            self._createRuntime = lambda size, warm: create_backend(backend, protopath, modelpath, onnxpath, threads,
+                                                                    size if warm else None)
+        else:
+            self._createRuntime = lambda size, warm: OpenCVBackend(
+                load_net(protopath, modelpath, onnxpath, size if warm else None),
+                cv2.dnn.DNN_BACKEND_OPENCV if backend is None else backend,
+                cv2.dnn.DNN_TARGET_CPU if target is None else target)
+
+        size = self.inputSize or self.SIZE or frameSize
+        if size is not None:
+            self.runtime = self._createRuntime(tuple(size), True)
+        elif not isinstance(backend, str) or backend in ("opencv", "openvino"):
+            load_net(protopath, modelpath, onnxpath, None)
+
+        self.confidence = confidence if np.ndim(confidence) == 0 and not isinstance(confidence, dict) \
+            else class_thresholds(confidence, DEFAULT_CONFIDENCE)
+        self.classIDs = None if classes is None else [CLASSES.index(name) for name in classes]
+        self.nmsThreshold = nmsThreshold
+
+    def networkSize(self, W, H):
+        # (width, height) of the network input for a W x H frame
+        if self.inputSize is not None:
+            return tuple(self.inputSize)
+        return self.SIZE or (W, H)
+
+    def prepare(self, frame, size=None):
+        # the image to feed the network at size (networkSize by default)
+        # and the (W, H, offsetX, offsetY) that map its relative output
+        # coordinates back to the frame, for postprocess
+        (H, W) = frame.shape[:2]
+        (w, h) = size or self.networkSize(W, H)
+        if not self.letterbox:
+            return frame, (w, h), (W, H, 0.0, 0.0)
+
+        # scale the frame to fit and pad it with the mean color, which
+        # the network sees as zeros
+        scale = min(w / float(W), h / float(H))
+        (rw, rh) = (max(int(round(W * scale)), 1), max(int(round(H * scale)), 1))
+        (padX, padY) = ((w - rw) // 2, (h - rh) // 2)
+        image = np.empty((h, w) + frame.shape[2:], dtype=frame.dtype)
+        image[:] = self.MEAN
+        image[padY:padY + rh, padX:padX + rw] = cv2.resize(frame, (rw, rh))
+        return image, (w, h), (w / scale, h / scale, -padX / scale, -padY / scale)
+
+    def warmup(self, W, H):
+        # build the backend and warm it up for W x H frames before the
+        # first one arrives, e.g. with the frameSize of a ThreadedCapture
+        if self.runtime is None:
+            size = self.networkSize(W, H)
+            self.runtime = self._createRuntime(size, True)
+            if not isinstance(self.runtime, OpenCVBackend):
+                self.runtime.forward(np.zeros((1, 3, size[1], size[0]), dtype="float32"))
+
+    def _forward(self, blob):
+        # without warmup() the backend is built on the first frame, whose
+        # forward pass then does the initialization of the net
+        if self.runtime is None:
+            (h, w) = blob.shape[2:]
+            self.runtime = self._createRuntime((w, h), False)
+        return self.runtime.forward(blob)
+
+    def forward(self, frame):
+        # run the raw network on one frame
+        (image, size, _) = self.prepare(frame)
+        blob = cv2.dnn.blobFromImage(image, self.SCALE, size, self.MEAN)
+        return self._forward(blob)
+
+    def postprocess(self, detections, W, H, offsetX=0.0, offsetY=0.0):
+        # decode the raw output and suppress the overlapping boxes of
+        # each class, the boxes are truncated to whole pixels like the
+        # scripts used to. Suppression keeps the overlap measure and
+        # visiting order of the original non_max_suppression_fast
+        results = decode_detections(detections, W, H, self.confidence, self.classIDs)
+        results[:, :4] += np.array([offsetX, offsetY, offsetX, offsetY])
+        results[:, :4] = np.trunc(results[:, :4])
+        if self.nmsThreshold is not None and len(results) > 0:
+            keep = batched_nms(results[:, :4], None, results[:, 5], self.nmsThreshold, "overlap")
+            results = results[keep]
+        return results
+
+    def detect(self, frame):
+        # detect objects in a frame, returns an (N, 6) array of
+        # (startX, startY, endX, endY, score, class)
+        (image, size, mapping) = self.prepare(frame)
+        blob = cv2.dnn.blobFromImage(image, self.SCALE, size, self.MEAN)
+        return self.postprocess(self._forward(blob), *mapping)
+
+    def forwardBatch(self, frames, size=None):
+        # run the raw network once on a batch of frames, all brought to
+        # size (the network size of the first frame by default). Returns
+        # the raw output, whose first column is the index of the frame of
+        # every row, and the coordinate mapping of every frame
+        if size is None:
+            (H, W) = frames[0].shape[:2]
+            size = self.networkSize(W, H)
+        prepared = [self.prepare(frame, size) for frame in frames]
+        blob = cv2.dnn.blobFromImages([image for (image, _, _) in prepared], self.SCALE, size, self.MEAN)
+        return self._forward(blob), [mapping for (_, _, mapping) in prepared]
+
+    def detectBatch(self, frames, size=None):
+        # detect objects in several frames with a single forward pass,
+        # returns one (N, 6) array per frame like detect. The frames
+        # may come from different sources, every frame is decoded with
+        # its own coordinate mapping
+        (detections, mappings) = self.forwardBatch(frames, size)
+        rows = detections.reshape(-1, 7)
+        image = rows[:, 0].astype("int")
+        return [self.postprocess(rows[image == i], *mapping) for (i, mapping) in enumerate(mappings)]
+
+
+class FaceDetectionEngine(DetectionEngine):
+    # the res10 SSD face detector has the same output layout as
+    # MobileNet-SSD (class 1 is a face) but its own preprocessing
+    SCALE = 1.0
+    MEAN = (104.0, 177.0, 123.0)
+    SIZE = (300, 300)
+
+    def __init__(self, protopath=FACE_PROTOTXT_PATH, modelpath=FACE_MODEL_PATH, confidence=0.5,
+                 nmsThreshold=None, backend=None, target=None, inputSize=None, letterbox=False, onnxpath=None,
+                 threads=None, frameSize=None):
+        DetectionEngine.__init__(self, protopath, modelpath, confidence, None, nmsThreshold, backend, target,
+                                 inputSize, letterbox, onnxpath, threads, frameSize)
@@ -0,0 +1,140 @@
+# import the necessary packages
+import numpy as np
+
+
+def points_in_polygon(points, polygon):
+    # even-odd ray casting of every point against every edge of the
+    # polygon at once, returns a boolean per point
+    points = np.asarray(points, dtype="float64").reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype="float64").reshape(-1, 2)
+    (x, y) = (points[:, 0:1], points[:, 1:2])
+    (x1, y1) = (polygon[:, 0], polygon[:, 1])
+    (x2, y2) = (np.roll(x1, -1), np.roll(y1, -1))
+
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atX = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return (crosses & (x < atX)).sum(axis=1) % 2 == 1
+
+
+def record_dtype(zoneCount):
+    # one finished track: its object ID, the timestamps (in seconds) of
+    # its first and last frame, its dwell time and its time in every zone
+    return np.dtype([("objectID", "int64"), ("first", "float64"), ("last", "float64"),
+                     ("dwell", "float64"), ("zones", "float64", (zoneCount,))])
+
+
+class DwellAccumulator:
+    def __init__(self, zones=(), capacity=64):
+        # dwell time of the tracked objects from the timestamps of the
+        # frames, in seconds: an object present in two consecutive
+        # frames is credited with the time between them, in total and in
+        # every zone (polygon of (x, y) points) its centroid is in. The
+        # times are kept in arrays indexed by slot, one slot per object
+        # being tracked, and every object that disappears is emitted as
+        # a finished record (see record_dtype) and frees its slot
+        self.zones = [np.asarray(zone, dtype="float64").reshape(-1, 2) for zone in zones]
+        self.dtype = record_dtype(len(self.zones))
+        self.timestamp = None
+
+        self.capacity = 0
+        self._ids = np.empty(0, dtype="int64")
+        self._first = np.empty(0, dtype="float64")
+        self._last = np.empty(0, dtype="float64")
+        self._dwell = np.empty(0, dtype="float64")
+        self._zones = np.empty((0, len(self.zones)), dtype="float64")
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype="int64")])
+        self._first = np.concatenate([self._first, np.zeros(extra)])
+        self._last = np.concatenate([self._last, np.zeros(extra)])
+        self._dwell = np.concatenate([self._dwell, np.zeros(extra)])
+        self._zones = np.concatenate([self._zones, np.zeros((extra, len(self.zones)))])
+        self.capacity = capacity
+
+    def _slots(self, ids):
+        # slot of every object ID, -1 for the IDs without a slot yet
+        active = np.flatnonzero(self._ids >= 0)
+        order = active[self._ids[active].argsort()]
+        position = np.searchsorted(self._ids[order], ids)
+        position = np.minimum(position, max(len(order) - 1, 0))
+        slots = np.full(len(ids), -1, dtype="int64")
+        if len(order) > 0:
+            found = self._ids[order[position]] == ids
+            slots[found] = order[position[found]]
+        return slots
+
+    def _records(self, slots):
+        records = np.zeros(len(slots), dtype=self.dtype)
+        records["objectID"] = self._ids[slots]
+        records["first"] = self._first[slots]
+        records["last"] = self._last[slots]
+        records["dwell"] = self._dwell[slots]
+        records["zones"] = self._zones[slots]
+        return records
+
+    def _emit(self, slots):
+        records = self._records(slots)
+        self._ids[slots] = -1
+        return records
+
+    def inZones(self, centroids):
+        # (N, zones) membership of the centroids
+        centroids = np.asarray(centroids, dtype="float64").reshape(-1, 2)
+        if not self.zones:
+            return np.zeros((len(centroids), 0), dtype=bool)
+        return np.column_stack([points_in_polygon(centroids, zone) for zone in self.zones])
+
+    def update(self, ids, centroids, timestamp):
+        # account one frame: the IDs and centroids of the objects tracked
+        # on it and its timestamp in seconds. Returns the records of the
+        # objects that are not tracked anymore
+        ids = np.asarray(ids, dtype="int64")
+        elapsed = 0.0 if self.timestamp is None else max(timestamp - self.timestamp, 0.0)
+        self.timestamp = timestamp
+
+        slots = self._slots(ids)
+        present = np.zeros(self.capacity, dtype=bool)
+        present[slots[slots >= 0]] = True
+        finished = self._emit(np.flatnonzero((self._ids >= 0) & ~present))
+
+        # the objects seen on the previous frame too were there for the
+        # whole interval
+        seen = slots >= 0
+        self._dwell[slots[seen]] += elapsed
+        self._zones[slots[seen]] += elapsed * self.inZones(np.asarray(centroids)[seen])
+        self._last[slots[seen]] = timestamp
+
+        # the new objects take free slots
+        new = np.flatnonzero(~seen)
+        free = np.flatnonzero(self._ids < 0)
+        if len(free) < len(new):
+            self._grow(max(self.capacity * 2, self.capacity + len(new) - len(free)))
+            free = np.flatnonzero(self._ids < 0)
+        free = free[:len(new)]
+        self._ids[free] = ids[new]
+        self._first[free] = timestamp
+        self._last[free] = timestamp
+        self._dwell[free] = 0.0
+        self._zones[free] = 0.0
+        return finished
+
+    def dwell(self, ids):
+        # current dwell time of the given (tracked) object IDs
+        slots = self._slots(np.asarray(ids, dtype="int64"))
+        return np.where(slots >= 0, self._dwell[slots], 0.0)
+
+    def active(self):
+        # the records the objects still tracked would have if they
+        # finished now, without ending them
+        return self._records(np.flatnonzero(self._ids >= 0))
+
+    def flush(self):
+        # the records of every object still tracked, e.g. at the end of
+        # a video
+        return self._emit(np.flatnonzero(self._ids >= 0))
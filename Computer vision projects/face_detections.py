@@ -1,7 +1,7 @@
 import cv2
 import datetime
-import imutils
 import numpy as np
+from threaded_capture import ThreadedCapture
 
 protopath = "deploy.prototxt"
 modelpath = "res10_300x300_ssd_iter_140000.caffemodel"
@@ -11,7 +11,7 @@ detector = cv2.dnn.readNetFromCaffe(prototxt=protopath, caffeModel=modelpath)
 # detector.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
 
 def main():
-    cap = cv2.VideoCapture('test_video.mp4')
+    cap = ThreadedCapture('test_video.mp4', width=600)
 
     fps_start_time = datetime.datetime.now()
     fps = 0
@@ -19,7 +19,8 @@ def main():
 
     while True:
         ret, frame = cap.read()
-        frame = imutils.resize(frame, width=600)
+        if not ret:
+            break
         total_frames = total_frames + 1
 
         (H, W) = frame.shape[:2]
@@ -54,6 +55,7 @@ def main():
         if key == ord('q'):
             break
 
+    cap.stop()
     cv2.destroyAllWindows()
 
 
@@ -1,10 +1,10 @@
 import cv2
 import datetime
-import imutils
+from threaded_capture import ThreadedCapture
 
 
 def main():
-    cap = cv2.VideoCapture('test_video.mp4')
+    cap = ThreadedCapture('test_video.mp4', width=800)
 
     fps_start_time = datetime.datetime.now()
     fps = 0
@@ -12,7 +12,8 @@ def main():
 
     while True:
         ret, frame = cap.read()
-        frame = imutils.resize(frame, width=800)
+        if not ret:
+            break
         total_frames = total_frames + 1
 
         fps_end_time = datetime.datetime.now()
@@ -31,6 +32,7 @@ def main():
         if key == ord('q'):
             break
 
+    cap.stop()
     cv2.destroyAllWindows()
 
 
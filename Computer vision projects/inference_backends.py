@@ -0,0 +1,181 @@
+# import the necessary packages
+from model_manager import MODELS
+import importlib.util
+import numpy as np
+import socket
+import json
+import time
+import os
+import cv2
+
+# where the auto-tuner keeps the fastest configuration of every host
+TUNING_PATH = "inference_tuning.json"
+
+BACKENDS = ("opencv", "openvino", "onnxruntime", "onnxruntime-int8")
+
+# the OpenCV thread count this process settled on, None until it does
+_processThreads = None
+
+
+def set_threads(count):
+    # size the OpenCV thread pool, which is process wide, and remember
+    # it so tuned_backend leaves a count the process chose alone
+    global _processThreads
+    cv2.setNumThreads(count)
+    _processThreads = count
+
+
+class OpenCVBackend:
+    def __init__(self, net, backend=cv2.dnn.DNN_BACKEND_OPENCV, target=cv2.dnn.DNN_TARGET_CPU):
+        # cv2.dnn, with its own implementation (default) or OpenVINO
+        # (DNN_BACKEND_INFERENCE_ENGINE). The nets are shared in the
+        # process, so the preferences are applied again before every
+        # forward pass in case another engine changed them. The thread
+        # pool of OpenCV is process wide, it is not a setting of the
+        # backend: it is set once per process with set_threads (the
+        # worker processes use 1, tuned_backend applies the tuned count)
+        self.net = net
+        self.backend = backend
+        self.target = target
+
+    def forward(self, blob):
+        self.net.setPreferableBackend(self.backend)
+        self.net.setPreferableTarget(self.target)
+        self.net.setInput(blob)
+        return self.net.forward()
+
+
+class OnnxRuntimeBackend:
+    def __init__(self, onnxpath, threads=None):
+        # ONNX Runtime on the CPU, for an ONNX export of the model that
+        # keeps the DetectionOutput layout of the Caffe model
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads is not None:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnxpath, options, providers=["CPUExecutionProvider"])
+        self.inputName = self.session.get_inputs()[0].name
+
+    def forward(self, blob):
+        return self.session.run(None, {self.inputName: blob})[0]
+
+
+def quantized_model(onnxpath):
+    # int8 (dynamically quantized) copy of an ONNX model, created once
+    # next to it
+    quantized = os.path.splitext(onnxpath)[0] + ".int8.onnx"
+    if not os.path.exists(quantized):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(onnxpath, quantized, weight_type=QuantType.QInt8)
+    return quantized
+
+
+def available_backends(onnxpath=None):
+    # the backends that can run on this host with this model
+    names = ["opencv"]
+    if len(cv2.dnn.getAvailableTargets(cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE)) > 0:
+        names.append("openvino")
+    if onnxpath is not None and os.path.exists(onnxpath):
+        if importlib.util.find_spec("onnxruntime") is not None:
+            names.append("onnxruntime")
+            names.append("onnxruntime-int8")
+    return names
+
+
+def create_backend(name, protopath, modelpath, onnxpath=None, threads=None, warmupSize=(300, 300)):
+    # build the backend called `name` (one of BACKENDS) for a model.
+    # threads only applies to the ONNX Runtime sessions, the OpenCV
+    # backends use the thread pool of the process (see set_threads)
+    if name == "opencv":
+        return OpenCVBackend(MODELS.load(protopath, modelpath, onnxpath, warmupSize))
+    if name == "openvino":
+        return OpenCVBackend(MODELS.load(protopath, modelpath, onnxpath, warmupSize),
+                             cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE, cv2.dnn.DNN_TARGET_CPU)
+    if name in ("onnxruntime", "onnxruntime-int8"):
+        if onnxpath is None or not os.path.exists(onnxpath):
+            raise ValueError("the {} backend needs an ONNX model".format(name))
+        if name == "onnxruntime-int8":
+            onnxpath = quantized_model(onnxpath)
+        return OnnxRuntimeBackend(onnxpath, threads)
+    raise ValueError("unknown inference backend: {}".format(name))
+
+
+def _tuning_key(protopath, modelpath, onnxpath, size):
+    return "{}|{}|{}|{}x{}".format(socket.gethostname(), os.path.basename(modelpath),
+                                   os.path.basename(onnxpath or ""), size[0], size[1])
+
+
+def autotune(protopath, modelpath, onnxpath=None, size=(300, 300), threadCounts=None, repeats=10,
+             path=TUNING_PATH):
+    # time every available backend on the model at the given (width,
+    # height) input size with every thread count -- the intra-op
+    # threads of the ONNX Runtime sessions, the OpenCV thread pool for
+    # the others, restored once the sweep is over -- and store the
+    # fastest (backend, threads) for this host and size in `path`.
+    # Returns the stored entry
+    if threadCounts is None:
+        cores = os.cpu_count() or 1
+        threadCounts = sorted(set([1, max(cores // 2, 1), cores]))
+
+    (w, h) = size
+    blob = np.random.default_rng(0).uniform(-1, 1, size=(1, 3, h, w)).astype("float32")
+    results = []
+    previous = cv2.getNumThreads()
+    try:
+        for name in available_backends(onnxpath):
+            for threads in threadCounts:
+                if not name.startswith("onnxruntime"):
+                    cv2.setNumThreads(threads)
+                try:
+                    backend = create_backend(name, protopath, modelpath, onnxpath, threads, size)
+                    backend.forward(blob)
+                except Exception as e:
+                    print("[INFO] skipping {} with {} threads: {}".format(name, threads, e))
+                    continue
+
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    backend.forward(blob)
+                    timings.append(time.perf_counter() - start)
+                results.append(dict(backend=name, threads=threads, ms=float(np.median(timings) * 1000.0)))
+    finally:
+        cv2.setNumThreads(previous)
+
+    if not results:
+        raise RuntimeError("no inference backend could run {}".format(modelpath))
+
+    best = min(results, key=lambda result: result["ms"])
+    entry = dict(backend=best["backend"], threads=best["threads"], ms=best["ms"], results=results)
+
+    tuning = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            tuning = json.load(f)
+    tuning[_tuning_key(protopath, modelpath, onnxpath, size)] = entry
+
+    # written atomically, worker processes may tune at the same time
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp, "w") as f:
+        json.dump(tuning, f, indent=2, sort_keys=True)
+    os.replace(temp, path)
+    return entry
+
+
+def tuned_backend(protopath, modelpath, onnxpath=None, size=(300, 300), path=TUNING_PATH):
+    # the fastest backend of this host for the model, tuned on the first
+    # run and read back from `path` on the later ones. The tuned OpenCV
+    # thread count is applied once per process, unless the process
+    # already chose one with set_threads
+    entry = None
+    if os.path.exists(path):
+        with open(path) as f:
+            entry = json.load(f).get(_tuning_key(protopath, modelpath, onnxpath, size))
+    if entry is None:
+        entry = autotune(protopath, modelpath, onnxpath, size, path=path)
+        print("[INFO] tuned inference: {} with {} threads ({:.1f} ms)".format(
+            entry["backend"], entry["threads"] or cv2.getNumThreads(), entry["ms"]))
+    if not entry["backend"].startswith("onnxruntime") and entry["threads"] is not None and _processThreads is None:
+        set_threads(entry["threads"])
+    return create_backend(entry["backend"], protopath, modelpath, onnxpath, entry["threads"], size)
@@ -0,0 +1,156 @@
+# import the necessary packages
+from multiprocessing import shared_memory
+from detection_engine import DetectionEngine, FaceDetectionEngine
+from inference_backends import set_threads
+import multiprocessing as mp
+import numpy as np
+
+ENGINES = {
+    "ssd": DetectionEngine,
+    "face": FaceDetectionEngine,
+}
+
+
+def _worker(memoryName, ringShape, tasks, results, model, options):
+    # each worker owns its own loaded net and reads the frames straight
+    # from the shared ring buffer, no frame is ever pickled. The first
+    # message of a worker tells whether its net could be loaded
+    memory = shared_memory.SharedMemory(name=memoryName)
+    ring = np.ndarray(ringShape, dtype="uint8", buffer=memory.buf)
+    try:
+        try:
+            # the pool already spreads the work over the cores, one
+            # thread per worker avoids oversubscribing them
+            set_threads(1)
+            engine = ENGINES[model](**options)
+        except Exception as e:
+            results.put((None, None, None, e))
+            return
+        results.put((None, None, None, None))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            (sequence, slot, H, W) = task
+            try:
+                results.put((sequence, slot, engine.detect(ring[slot, :H, :W]), None))
+            except Exception as e:
+                results.put((sequence, slot, None, e))
+    finally:
+        del ring
+        memory.close()
+
+
+class InferencePool:
+    def __init__(self, workers=None, frameShape=(338, 600, 3), slots=None, model="ssd", preload=True,
+                 **options):
+        # run the detector in `workers` processes (one per core by
+        # default) so that inference and its Python post-processing use
+        # every core. Frames are copied once into a ring of `slots`
+        # shared memory buffers of frameShape (the largest frame size
+        # expected) and only their slot index travels to the workers.
+        # Results come back in submission order, whichever worker
+        # finished first. The options are passed to the engine of the
+        # model ("ssd" for MobileNet-SSD, "face" for res10). With
+        # preload the net is loaded (and warmed up) here before the
+        # workers are forked, so they share it instead of each parsing
+        # the model files again
+        self.workers = workers or mp.cpu_count()
+        self.slots = slots or 2 * self.workers
+        self.frameShape = tuple(frameShape)
+
+        ringShape = (self.slots,) + self.frameShape
+        self._memory = shared_memory.SharedMemory(create=True, size=int(np.prod(ringShape)))
+        self._ring = np.ndarray(ringShape, dtype="uint8", buffer=self._memory.buf)
+
+        if preload and mp.get_start_method() == "fork":
+            ENGINES[model](**options)
+
+        self._tasks = mp.Queue()
+        self._results = mp.Queue()
+        self._processes = [mp.Process(target=_worker, daemon=True,
+                                      args=(self._memory.name, ringShape, self._tasks, self._results,
+                                            model, options))
+                           for _ in range(self.workers)]
+        for process in self._processes:
+            process.start()
+
+        # wait for every worker to load its net, so a missing model
+        # fails here rather than leaving the frames unanswered
+        errors = [self._results.get()[3] for _ in self._processes]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            self.close()
+            raise errors[0]
+
+        # free slots, results received but not handed out yet, and the
+        # sequence numbers of the next frame submitted / returned
+        self._free = list(range(self.slots))
+        self._done = {}
+        self._submitted = 0
+        self._returned = 0
+
+    def _receive(self):
+        # wait for one result from any worker and recycle its slot
+        (sequence, slot, result, error) = self._results.get()
+        self._free.append(slot)
+        self._done[sequence] = (result, error)
+
+    def submit(self, frame):
+        # copy a frame into a free slot and queue it, waiting for a slot
+        # to be released if all of them are in use. Returns the sequence
+        # number of the frame
+        (H, W) = frame.shape[:2]
+        if H > self.frameShape[0] or W > self.frameShape[1] or frame.shape[2:] != self.frameShape[2:]:
+            raise ValueError("frame of shape {} does not fit the buffers of shape {}".format(
+                frame.shape, self.frameShape))
+
+        while not self._free:
+            self._receive()
+        slot = self._free.pop()
+        self._ring[slot, :H, :W] = frame
+
+        sequence = self._submitted
+        self._tasks.put((sequence, slot, H, W))
+        self._submitted += 1
+        return sequence
+
+    def pending(self):
+        # number of frames submitted whose detections were not returned
+        return self._submitted - self._returned
+
+    def get(self):
+        # detections of the oldest frame not returned yet, in the same
+        # (N, 6) layout as DetectionEngine.detect
+        if self.pending() == 0:
+            raise ValueError("no frame submitted")
+
+        while self._returned not in self._done:
+            self._receive()
+        (result, error) = self._done.pop(self._returned)
+        self._returned += 1
+        if error is not None:
+            raise error
+        return result
+
+    def map(self, frames):
+        # detect objects in a stream of frames, keeping every slot busy,
+        # and yield the detections in order
+        for frame in frames:
+            if self.pending() == self.slots:
+                yield self.get()
+            self.submit(frame)
+        while self.pending() > 0:
+            yield self.get()
+
+    def close(self):
+        # stop the workers and release the shared memory
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join()
+        del self._ring
+        self._memory.close()
+        self._memory.unlink()
@@ -0,0 +1,68 @@
+# import the necessary packages
+import numpy as np
+import time
+import os
+import cv2
+
+
+class ModelManager:
+    def __init__(self):
+        # load every network once per process and keep it: the first
+        # caller pays for parsing the files and for a warm-up forward
+        # pass (the first inference of a net allocates and initializes
+        # all its layers), later callers get the ready net. Loading the
+        # networks in a parent process before forking workers lets the
+        # children share the weights copy-on-write instead of parsing
+        # the files again. The load and warm-up times of every network
+        # are kept in `timings`, in milliseconds. A net is warmed up
+        # once per input size it is asked for, the first forward pass
+        # at a new size reallocates the buffers of every layer
+        self.timings = {}
+        self._nets = {}
+        self._warmed = set()
+
+    def load(self, protopath, modelpath, onnxpath=None, warmupSize=(300, 300)):
+        # return the network of a Caffe prototxt/caffemodel pair. When
+        # onnxpath points to an ONNX export of the same network it is
+        # loaded instead, parsing a binary ONNX file is much faster than
+        # the text prototxt. OpenCV cannot write ONNX, the export has to
+        # be produced once with an external converter (e.g. caffe2onnx)
+        # and must keep the DetectionOutput layout of the Caffe model
+        # warmupSize is the (width, height) the net is going to run at,
+        # None to skip the warm-up (e.g. when it is not known yet)
+        useOnnx = onnxpath is not None and os.path.exists(onnxpath)
+        key = (onnxpath,) if useOnnx else (protopath, modelpath)
+        if key not in self._nets:
+            start = time.perf_counter()
+            if useOnnx:
+                net = cv2.dnn.readNetFromONNX(onnxpath)
+            else:
+                net = cv2.dnn.readNetFromCaffe(prototxt=protopath, caffeModel=modelpath)
+            self.timings[key] = dict(load_ms=(time.perf_counter() - start) * 1000.0, warmup_ms={})
+            self._nets[key] = net
+
+        net = self._nets[key]
+        if warmupSize is not None and (key, tuple(warmupSize)) not in self._warmed:
+            (w, h) = warmupSize
+            start = time.perf_counter()
+            net.setInput(np.zeros((1, 3, h, w), dtype="float32"))
+            net.forward()
+            self.timings[key]["warmup_ms"]["{}x{}".format(w, h)] = (time.perf_counter() - start) * 1000.0
+            self._warmed.add((key, tuple(warmupSize)))
+        return net
+
+    def loaded(self):
+        # keys of the networks loaded in this process
+        return list(self._nets.keys())
+
+    def report(self):
+        lines = []
+        for (key, timing) in self.timings.items():
+            warmups = ", ".join("{:.1f} ms at {}".format(ms, size) for (size, ms) in timing["warmup_ms"].items())
+            lines.append("[INFO] {}: loaded in {:.1f} ms, warmed up in {}".format(
+                os.path.basename(key[-1]), timing["load_ms"], warmups or "-"))
+        return "\n".join(lines)
+
+
+# the networks of this process
+MODELS = ModelManager()
@@ -0,0 +1,106 @@
+# import the necessary packages
+import numpy as np
+import cv2
+
+
+class MotionGate:
+    def __init__(self, method="diff", width=160, threshold=25, minChange=0.002, history=500):
+        # cheap per frame decision of whether anything moved, made on a
+        # grayscale copy of the frame downscaled to `width` pixels:
+        #   diff  -- absolute difference with the previous frame
+        #   mog2  -- MOG2 background subtractor, more robust to noise and
+        #            slow lighting changes, a bit more expensive
+        # a frame is moving when more than minChange of its pixels
+        # changed. The changed areas of the last frame are kept in
+        # `regions`, as (startX, startY, endX, endY) boxes in frame
+        # coordinates
+        if method not in ("diff", "mog2"):
+            raise ValueError("unknown motion gate method: {}".format(method))
+
+        self.method = method
+        self.width = width
+        self.threshold = threshold
+        self.minChange = minChange
+        self.regions = np.empty((0, 4), dtype="int")
+
+        self._previous = None
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=threshold,
+                                                                  detectShadows=False)
+
+    def _mask(self, small):
+        if self._subtractor is not None:
+            return self._subtractor.apply(small)
+
+        previous = self._previous
+        self._previous = small
+        if previous is None:
+            return np.full(small.shape, 255, dtype="uint8")
+        (_, mask) = cv2.threshold(cv2.absdiff(small, previous), self.threshold, 255, cv2.THRESH_BINARY)
+        return mask
+
+    def moving(self, frame):
+        # update the gate with a new frame and tell whether it moved
+        (H, W) = frame.shape[:2]
+        scale = W / float(self.width)
+        small = cv2.resize(frame, (self.width, max(int(round(H / scale)), 1)), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        mask = cv2.dilate(self._mask(small), None, iterations=2)
+        changed = cv2.countNonZero(mask)
+
+        # bounding boxes of the changed blobs, scaled back to the frame
+        (count, _, stats, _) = cv2.connectedComponentsWithStats(mask)
+        stats = stats[1:count]
+        boxes = np.column_stack([stats[:, 0], stats[:, 1],
+                                 stats[:, 0] + stats[:, 2], stats[:, 1] + stats[:, 3]])
+        self.regions = np.round(boxes.reshape(-1, 4) * scale).astype("int")
+
+        return changed > self.minChange * mask.size
+
+
+class GatedDetector:
+    def __init__(self, detector, gate=None, auditInterval=0):
+        # run `detector` only on the frames the motion gate lets through.
+        # The other frames are treated like the frames skipped by a
+        # detection interval: detect returns None for them and the
+        # caller only predicts its tracks, a person standing still is
+        # not deregistered after maxDisappeared static frames. To know what skipping costs, every auditInterval-th
+        # skipped frame is run through the detector anyway and whatever
+        # it finds there is counted as missed (the result is still
+        # dropped, the audit does not change the tracking)
+        self.detector = detector
+        self.gate = gate if gate is not None else MotionGate()
+        self.auditInterval = auditInterval
+
+        self.frames = 0
+        self.skipped = 0
+        self.audited = 0
+        self.missed = 0
+
+    def detect(self, frame):
+        # detections of the frame, in the (N, 6) layout of the detector,
+        # or None when the frame was skipped
+        self.frames += 1
+        if self.gate.moving(frame):
+            return self.detector.detect(frame)
+
+        self.skipped += 1
+        if self.auditInterval > 0 and self.skipped % self.auditInterval == 0:
+            self.audited += 1
+            self.missed += len(self.detector.detect(frame))
+        return None
+
+    def warmup(self, W, H):
+        self.detector.warmup(W, H)
+
+    def report(self):
+        text = "[INFO] motion gate: {} frames, {} inferences skipped ({:.1f}%)".format(
+            self.frames, self.skipped, 100.0 * self.skipped / max(self.frames, 1))
+        if self.audited > 0:
+            text += ", {} detections missed in {} audited frames ({:.2f} per audited frame)".format(
+                self.missed, self.audited, self.missed / float(self.audited))
+        return text
@@ -0,0 +1,197 @@
+# import the necessary packages
+import numpy as np
+
+# below this many boxes a plain greedy loop is faster than the
+# vectorized passes of nms (the crossover is printed by benchmark_nms.py)
+GREEDY_BELOW = 24
+
+
+def _order(boxes, scores):
+    # visiting order of the greedy suppression: highest score first, or
+    # lowest box bottom first like the original implementation when no
+    # scores are given
+    if scores is None:
+        return np.argsort(boxes[:, 3])[::-1]
+    return np.argsort(-np.asarray(scores), kind="stable")
+
+
+def candidate_pairs(boxes, pad=0.0):
+    # the (first, second) pairs of boxes whose x ranges intersect, found
+    # with a sweep over the sorted left edges instead of scoring all
+    # N * N pairs: every box is only paired with the boxes that start
+    # before it ends. Each pair is listed once, first <= second in
+    # sweep order
+    order = boxes[:, 0].argsort(kind="stable")
+    left = boxes[order, 0]
+    ends = np.searchsorted(left, boxes[order, 2] + pad, side="right")
+    counts = np.maximum(ends - np.arange(len(order)) - 1, 0)
+
+    # expand the ranges into explicit pairs of box indexes
+    total = counts.sum()
+    first = np.repeat(np.arange(len(order)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[first], order[first + 1 + within]
+
+
+def _overlaps(boxes, a, b, metric, pad):
+    # overlap of the boxes a (visited first) and b (visited second)
+    (x1, y1, x2, y2) = boxes.T
+    w = np.maximum(0, np.minimum(x2[a], x2[b]) - np.maximum(x1[a], x1[b]) + pad)
+    h = np.maximum(0, np.minimum(y2[a], y2[b]) - np.maximum(y1[a], y1[b]) + pad)
+    inter = w * h
+    area = (x2 - x1 + pad) * (y2 - y1 + pad)
+    if metric == "overlap":
+        return inter / area[b]
+    if metric == "min":
+        return inter / np.maximum(np.minimum(area[a], area[b]), 1e-9)
+    return inter / np.maximum(area[a] + area[b] - inter, 1e-9)
+
+
+def _greedy_nms(boxes, order, threshold, metric, pad):
+    # the textbook loop: keep the next box in visiting order and drop
+    # the remaining boxes it overlaps too much
+    (x1, y1, x2, y2) = boxes.T.tolist()
+    area = [(r - l + pad) * (b - t + pad) for (l, t, r, b) in zip(x1, y1, x2, y2)]
+    remaining = order.tolist()
+    keep = []
+    while remaining:
+        i = remaining.pop(0)
+        keep.append(i)
+        survivors = []
+        for j in remaining:
+            w = min(x2[i], x2[j]) - max(x1[i], x1[j]) + pad
+            h = min(y2[i], y2[j]) - max(y1[i], y1[j]) + pad
+            inter = w * h if w > 0 and h > 0 else 0.0
+            if metric == "overlap":
+                overlap = inter / area[j] if area[j] else float("nan")
+            elif metric == "min":
+                overlap = inter / max(min(area[i], area[j]), 1e-9)
+            else:
+                overlap = inter / max(area[i] + area[j] - inter, 1e-9)
+            if not overlap > threshold:
+                survivors.append(j)
+        remaining = survivors
+    return np.array(keep, dtype="int64")
+
+
+def nms(boxes, scores=None, threshold=0.3, metric="iou", greedyBelow=GREEDY_BELOW):
+    # vectorized greedy NMS: the overlaps between every box and the
+    # boxes visited before it (the upper triangle of the overlap matrix,
+    # restricted to the pairs that can overlap at all) are computed in
+    # one pass, then a box is kept when no kept box visited before it
+    # overlaps it too much. Starting from "keep all", each vectorized
+    # pass fixes at least the next box in visiting order, so the loop
+    # ends on exactly the greedy result -- in practice after a handful
+    # of passes. Returns the indexes of the kept boxes in visiting order.
+    # The overlap metric is "iou", "overlap" (intersection over the area
+    # of the box visited second, the measure of the original scripts) or
+    # "min" (intersection over the smaller of the two areas, symmetric).
+    # Fewer than greedyBelow boxes (the usual load of a frame) go through
+    # the plain greedy loop instead, which is faster there and keeps the
+    # same boxes
+    boxes = np.asarray(boxes, dtype="float64").reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype="int64")
+    if metric not in ("iou", "overlap", "min"):
+        raise ValueError("unknown overlap metric: {}".format(metric))
+
+    order = _order(boxes, scores)
+    pad = 1.0 if metric == "overlap" else 0.0
+    if len(boxes) < greedyBelow:
+        return _greedy_nms(boxes, order, threshold, metric, pad)
+
+    rank = np.empty(len(order), dtype="int64")
+    rank[order] = np.arange(len(order))
+
+    # orient every candidate pair as (visited first, visited second)
+    (a, b) = candidate_pairs(boxes, pad)
+    swap = rank[a] > rank[b]
+    (a, b) = (np.where(swap, b, a), np.where(swap, a, b))
+    overlap = _overlaps(boxes, a, b, metric, pad)
+
+    # the suppression edges, then the fixed point of "kept unless a
+    # kept box suppresses it"
+    suppressing = overlap > threshold
+    (a, b) = (a[suppressing], b[suppressing])
+    keep = np.ones(len(boxes), dtype=bool)
+    while True:
+        updated = np.ones(len(boxes), dtype=bool)
+        updated[b[keep[a]]] = False
+        if np.array_equal(updated, keep):
+            break
+        keep = updated
+
+    return order[keep[order]]
+
+
+def batched_nms(boxes, scores=None, groups=None, threshold=0.3, metric="iou", greedyBelow=GREEDY_BELOW):
+    # run NMS independently per group -- per class, per frame, per tile
+    # or any combination encoded as one integer -- in a single call, by
+    # moving every group to its own region of the plane so that boxes
+    # of different groups can never overlap
+    boxes = np.asarray(boxes, dtype="float64").reshape(-1, 4)
+    if groups is None or len(boxes) == 0:
+        return nms(boxes, scores, threshold, metric, greedyBelow)
+
+    groups = np.asarray(groups)
+    (_, groups) = np.unique(groups, return_inverse=True)
+    span = boxes.max() - min(boxes.min(), 0) + 1.0
+    shifted = boxes + (groups.astype("float64") * span)[:, None]
+    return nms(shifted, scores, threshold, metric, greedyBelow)
+
+
+def soft_nms(boxes, scores, sigma=0.5, threshold=0.001, method="gaussian", iouThreshold=0.3):
+    # Soft-NMS (Bodla et al.): instead of discarding the boxes that
+    # overlap a picked box, decay their scores -- with a gaussian of
+    # the IoU or linearly above iouThreshold -- and drop them only once
+    # their score falls below threshold. The picking is sequential, but
+    # each pick only touches the boxes that actually intersect it.
+    # Returns the kept indexes (in picking order) and their scores
+    if method not in ("gaussian", "linear"):
+        raise ValueError("unknown soft-NMS method: {}".format(method))
+    boxes = np.asarray(boxes, dtype="float64").reshape(-1, 4)
+    scores = np.array(scores, dtype="float64")
+
+    # IoU of the intersecting pairs, stored both ways and grouped by
+    # their first box so that the neighbours of a box are a slice
+    (a, b) = candidate_pairs(boxes)
+    (x1, y1, x2, y2) = boxes.T
+    w = np.maximum(0, np.minimum(x2[a], x2[b]) - np.maximum(x1[a], x1[b]))
+    h = np.maximum(0, np.minimum(y2[a], y2[b]) - np.maximum(y1[a], y1[b]))
+    inter = w * h
+    area = (x2 - x1) * (y2 - y1)
+    iou = inter / np.maximum(area[a] + area[b] - inter, 1e-9)
+    touching = iou > 0
+    source = np.concatenate([a[touching], b[touching]])
+    target = np.concatenate([b[touching], a[touching]])
+    iou = np.concatenate([iou[touching], iou[touching]])
+    grouped = source.argsort(kind="stable")
+    (target, iou) = (target[grouped], iou[grouped])
+    bounds = np.searchsorted(source[grouped], np.arange(len(boxes) + 1))
+
+    alive = scores >= threshold
+    keep = []
+    while alive.any():
+        i = np.flatnonzero(alive)[np.argmax(scores[alive])]
+        keep.append(i)
+        alive[i] = False
+
+        neighbours = target[bounds[i]:bounds[i + 1]]
+        overlap = iou[bounds[i]:bounds[i + 1]][alive[neighbours]]
+        neighbours = neighbours[alive[neighbours]]
+        if method == "gaussian":
+            scores[neighbours] *= np.exp(-(overlap ** 2) / sigma)
+        else:
+            scores[neighbours] *= np.where(overlap > iouThreshold, 1.0 - overlap, 1.0)
+        alive[neighbours] = scores[neighbours] >= threshold
+
+    keep = np.array(keep, dtype="int64")
+    return keep, scores[keep]
+
+
+def non_max_suppression_fast(boxes, overlapThresh):
+    # drop-in replacement of the original helper: same boxes kept, in
+    # the same order, but errors are raised instead of being printed
+    # and turned into None
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    return boxes[nms(boxes, None, overlapThresh, "overlap")].astype("int")
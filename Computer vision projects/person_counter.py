@@ -1,103 +1,54 @@
 import cv2
 import datetime
-import imutils
-import numpy as np
+import os
 from centroidtracker import CentroidTracker
+from detection_engine import DetectionEngine
+from trackersnapshot import SnapshotWriter, load_snapshot
+from tracking_loop import DetectionTracker, open_capture, tracker_options
+from motion_gate import GatedDetector, MotionGate
 
-protopath = "MobileNetSSD_deploy.prototxt"
-modelpath = "MobileNetSSD_deploy.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(prototxt=protopath, caffeModel=modelpath)
-detector.setPreferableBackend(cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE)
-detector.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+detector = DetectionEngine(backend="auto")
 
+# skip the detector on the frames where nothing moved, every 50th
+# skipped frame is audited to measure the detections lost
+gated_detector = GatedDetector(detector, MotionGate(), auditInterval=50)
 
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-           "sofa", "train", "tvmonitor"]
+# run the detector on every Nth frame only, see DetectionTracker
+DETECTION_INTERVAL = 1
 
-tracker = CentroidTracker(maxDisappeared=80, maxDistance=90)
+TRACKER_OPTIONS = tracker_options(DETECTION_INTERVAL, maxDisappeared=80, maxDistance=90)
+tracker = CentroidTracker(**TRACKER_OPTIONS)
 
-
-def non_max_suppression_fast(boxes, overlapThresh):
+# resume the tracks (and the object IDs already counted) from the
+# checkpoint a quit or a crash left behind, and keep checkpointing
+# every 100 frames. A checkpoint of other tracker settings is dropped
+SNAPSHOT_PATH = "person_counter.snapshot"
+if os.path.exists(SNAPSHOT_PATH):
     try:
-        if len(boxes) == 0:
-            return []
-
-        if boxes.dtype.kind == "i":
-            boxes = boxes.astype("float")
-
-        pick = []
-
-        x1 = boxes[:, 0]
-        y1 = boxes[:, 1]
-        x2 = boxes[:, 2]
-        y2 = boxes[:, 3]
-
-        area = (x2 - x1 + 1) * (y2 - y1 + 1)
-        idxs = np.argsort(y2)
-
-        while len(idxs) > 0:
-            last = len(idxs) - 1
-            i = idxs[last]
-            pick.append(i)
-
-            xx1 = np.maximum(x1[i], x1[idxs[:last]])
-            yy1 = np.maximum(y1[i], y1[idxs[:last]])
-            xx2 = np.minimum(x2[i], x2[idxs[:last]])
-            yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-            w = np.maximum(0, xx2 - xx1 + 1)
-            h = np.maximum(0, yy2 - yy1 + 1)
-
-            overlap = (w * h) / area[idxs[:last]]
-
-            idxs = np.delete(idxs, np.concatenate(([last],
-                                                   np.where(overlap > overlapThresh)[0])))
-
-        return boxes[pick].astype("int")
-    except Exception as e:
-        print("Exception occurred in non_max_suppression : {}".format(e))
+        (tracker, _) = load_snapshot(SNAPSHOT_PATH, config=TRACKER_OPTIONS)
+    except ValueError as e:
+        print("[INFO] starting over: {}".format(e))
+snapshots = SnapshotWriter(tracker, SNAPSHOT_PATH, interval=100)
+tracking = DetectionTracker(gated_detector, tracker, DETECTION_INTERVAL)
 
 
 def main():
-    cap = cv2.VideoCapture('test_video.mp4')
+    cap = open_capture('test_video.mp4', detector, width=600)
 
     fps_start_time = datetime.datetime.now()
     fps = 0
     total_frames = 0
     lpc_count = 0
     opc_count = 0
-    object_id_list = []
+    finished = False
     while True:
         ret, frame = cap.read()
-        frame = imutils.resize(frame, width=600)
+        if not ret:
+            finished = True
+            break
         total_frames = total_frames + 1
 
-        (H, W) = frame.shape[:2]
-
-        blob = cv2.dnn.blobFromImage(frame, 0.007843, (W, H), 127.5)
-
-        detector.setInput(blob)
-        person_detections = detector.forward()
-        rects = []
-        for i in np.arange(0, person_detections.shape[2]):
-            confidence = person_detections[0, 0, i, 2]
-            if confidence > 0.5:
-                idx = int(person_detections[0, 0, i, 1])
-
-                if CLASSES[idx] != "person":
-                    continue
-
-                person_box = person_detections[0, 0, i, 3:7] * np.array([W, H, W, H])
-                (startX, startY, endX, endY) = person_box.astype("int")
-                rects.append(person_box)
-
-        boundingboxes = np.array(rects)
-        boundingboxes = boundingboxes.astype(int)
-        rects = non_max_suppression_fast(boundingboxes, 0.3)
-
-        objects = tracker.update(rects)
+        objects = tracking.process(frame)
         for (objectId, bbox) in objects.items():
             x1, y1, x2, y2 = bbox
             x1 = int(x1)
@@ -109,9 +60,6 @@ def main():
             text = "ID: {}".format(objectId)
             cv2.putText(frame, text, (x1, y1-5), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 255), 1)
 
-            if objectId not in object_id_list:
-                object_id_list.append(objectId)
-
         fps_end_time = datetime.datetime.now()
         time_diff = fps_end_time - fps_start_time
         if time_diff.seconds == 0:
@@ -123,8 +71,12 @@ def main():
 
         cv2.putText(frame, fps_text, (5, 30), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 255), 1)
 
+        # every registered object ID is reported on the frame it was
+        # registered, so the number of IDs handed out is the number of
+        # people seen so far -- and it survives restarts
         lpc_count = len(objects)
-        opc_count = len(object_id_list)
+        opc_count = tracker.nextObjectID
+        snapshots.maybeSave(total_frames)
 
         lpc_txt = "LPC: {}".format(lpc_count)
         opc_txt = "OPC: {}".format(opc_count)
@@ -137,6 +89,14 @@ def main():
         if key == ord('q'):
             break
 
+    # a video played to the end is counted from scratch on the next
+    # run, only a quit (or a crash) leaves a checkpoint to resume from
+    if finished:
+        snapshots.discard()
+    else:
+        snapshots.close()
+    cap.stop()
+    print(gated_detector.report())
     cv2.destroyAllWindows()
 
 
@@ -1,41 +1,35 @@
 import cv2
-import numpy as np
 import imutils
+from detection_engine import DetectionEngine
+from class_dispatch import ClassDispatcher
 
-protopath = "MobileNetSSD_deploy.prototxt"
-modelpath = "MobileNetSSD_deploy.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(prototxt=protopath, caffeModel=modelpath)
+# more consumers served by the same forward pass, none by default:
+# {name: classes}, e.g. {"pets": ("cat", "dog"), "vehicles": ("bicycle",
+# "car", "motorbike", "bus")}. The engine then keeps their classes too,
+# each with its own score threshold, and their counts are printed
+EXTRA_SUBSCRIBERS = {}
 
-CLASSES = ["background", "aeroplane", "bicycle", "bird", "boat",
-           "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-           "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-           "sofa", "train", "tvmonitor"]
+detector = DetectionEngine(classes=("person",) + tuple(c for classes in EXTRA_SUBSCRIBERS.values() for c in classes),
+                           confidence={"person": 0.5, "cat": 0.4, "dog": 0.4}, nmsThreshold=None)
+dispatcher = ClassDispatcher(detector)
+dispatcher.subscribe("people", ("person",), track=False)
+for (name, classes) in EXTRA_SUBSCRIBERS.items():
+    dispatcher.subscribe(name, classes, track=False)
+
+COLORS = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255)]
 
 
 def main():
     image = cv2.imread('people.jpg')
     image = imutils.resize(image, width=600)
 
-    (H, W) = image.shape[:2]
-
-    blob = cv2.dnn.blobFromImage(image, 0.007843, (W, H), 127.5)
-
-    detector.setInput(blob)
-    person_detections = detector.forward()
-
-    for i in np.arange(0, person_detections.shape[2]):
-        confidence = person_detections[0, 0, i, 2]
-        if confidence > 0.5:
-            idx = int(person_detections[0, 0, i, 1])
-
-            if CLASSES[idx] != "person":
-                continue
-
-            person_box = person_detections[0, 0, i, 3:7] * np.array([W, H, W, H])
-            (startX, startY, endX, endY) = person_box.astype("int")
-
-            cv2.rectangle(image, (startX, startY), (endX, endY), (0, 0, 255), 2)
+    detections = dispatcher.detect(image)
+    for (i, (name, rows)) in enumerate(detections.items()):
+        for (startX, startY, endX, endY) in rows[:, :4].astype("int").tolist():
+            cv2.rectangle(image, (startX, startY), (endX, endY), COLORS[i % len(COLORS)], 2)
 
+    if EXTRA_SUBSCRIBERS:
+        print("[INFO] {}".format(", ".join("{} {}".format(len(rows), name) for (name, rows) in detections.items())))
     cv2.imshow("Results", image)
     cv2.waitKey(0)
     cv2.destroyAllWindows()
@@ -0,0 +1,95 @@
+# import the necessary packages
+from scipy.spatial.distance import pdist
+from centroidtracker import grid_pairs
+import numpy as np
+
+
+def condensed_pairs(count):
+    # the (i, j) index pairs, i < j, in the order of a condensed
+    # distance matrix as returned by pdist
+    return np.triu_indices(count, k=1)
+
+
+def close_pairs(points, distance, method="auto", gridThreshold=400):
+    # every pair of points closer than `distance`, as an (M, 2) array of
+    # indexes with i < j. "dense" scores all pairs with pdist (one
+    # condensed matrix, N(N-1)/2 values), "grid" only scores the pairs
+    # in neighbouring cells of a uniform grid whose cell size is the
+    # distance, which stays cheap when the number of points grows.
+    # "auto" switches to the grid above gridThreshold points
+    points = np.asarray(points, dtype="float64").reshape(-1, 2)
+    if len(points) < 2:
+        return np.empty((0, 2), dtype="int64")
+    if method == "auto":
+        method = "grid" if len(points) > gridThreshold else "dense"
+
+    if method == "dense":
+        (i, j) = condensed_pairs(len(points))
+        close = pdist(points) < distance
+        return np.column_stack([i[close], j[close]]).astype("int64")
+    if method == "grid":
+        (i, j, D) = grid_pairs(points, points, distance)
+        keep = (i < j) & (D < distance)
+        pairs = np.column_stack([i[keep], j[keep]]).astype("int64")
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    raise ValueError("unknown proximity method: {}".format(method))
+
+
+def union_find(count, pairs):
+    # connected components of the graph of `count` nodes and the given
+    # edges, vectorized: every node repeatedly hooks onto the smallest
+    # label among its neighbours, then the label pointers are
+    # compressed by pointer jumping, until nothing changes. Returns the
+    # label of every node, the smallest node index of its component
+    parent = np.arange(count)
+    if len(pairs) == 0:
+        return parent
+
+    (a, b) = (pairs[:, 0], pairs[:, 1])
+    while True:
+        (rootA, rootB) = (parent[a], parent[b])
+        low = np.minimum(rootA, rootB)
+        previous = parent.copy()
+        np.minimum.at(parent, rootA, low)
+        np.minimum.at(parent, rootB, low)
+
+        # pointer jumping, every node points straight at its root
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+        if np.array_equal(parent, previous):
+            return parent
+
+
+class ProximityEngine:
+    def __init__(self, distance=75.0, method="auto", gridThreshold=400):
+        # proximity checks of a set of tracked objects, all in NumPy: the
+        # pairs closer than `distance` (centroid to centroid), a flag
+        # per object that is part of such a pair, and the clusters of
+        # objects linked by close pairs. See close_pairs for the methods
+        self.distance = distance
+        self.method = method
+        self.gridThreshold = gridThreshold
+
+    def pairs(self, centroids):
+        return close_pairs(centroids, self.distance, self.method, self.gridThreshold)
+
+    def check(self, centroids):
+        # returns the violating pairs as an (M, 2) index array, the
+        # per object flags as a boolean array, and the cluster label of
+        # every object (-1 for the objects that are not flagged,
+        # otherwise the same label for the objects of one cluster,
+        # numbered from 0)
+        count = len(centroids)
+        pairs = self.pairs(centroids)
+        flags = np.zeros(count, dtype=bool)
+        flags[pairs.ravel()] = True
+
+        clusters = np.full(count, -1, dtype="int64")
+        if len(pairs) > 0:
+            roots = union_find(count, pairs)[flags]
+            clusters[flags] = np.unique(roots, return_inverse=True)[1]
+        return pairs, flags, clusters
@@ -0,0 +1,71 @@
+# import the necessary packages
+import numpy as np
+
+
+def _reflect(x, size):
+    # fold positions back into [0, size] as if the objects bounced off
+    # the borders of the frame
+    period = 2.0 * size
+    x = np.mod(x, period)
+    return size - np.abs(x - size)
+
+
+def generate_scene(count=50, frames=300, speed=3.0, crossing=0.0, dropout=0.0,
+                   frameSize=(1920, 1080), boxSize=(40, 80), noise=1.0, seed=0):
+    # generate synthetic ground truth trajectories and the detections a
+    # detector would produce for them:
+    #   count     -- number of objects in the scene
+    #   speed     -- speed of the objects, in pixels per frame
+    #   crossing  -- fraction of the objects that are paired up and sent
+    #                across each other's path (the hard case for IDs)
+    #   dropout   -- probability that a detection is missed in a frame
+    #   noise     -- standard deviation of the box jitter, in pixels
+    # returns one (objectIDs, rects) pair per frame, rects being int
+    # (startX, startY, endX, endY) boxes like the detector outputs
+    rng = np.random.default_rng(seed)
+    (W, H) = frameSize
+    t = np.arange(frames, dtype="float64")[:, None]
+
+    # free objects bounce around the frame with a constant velocity
+    angle = rng.uniform(0, 2 * np.pi, count)
+    velocity = np.stack([np.cos(angle), np.sin(angle)], axis=1) * speed
+    start = rng.uniform((0, 0), (W, H), size=(count, 2))
+    x = _reflect(start[:, 0] + velocity[:, 0] * t, W)
+    y = _reflect(start[:, 1] + velocity[:, 1] * t, H)
+    visible = np.ones((frames, count), dtype=bool)
+
+    # crossing objects come in pairs that meet head on at a random
+    # point and frame, slightly offset so their boxes overlap
+    pairs = int(count * crossing) // 2
+    if pairs > 0:
+        a = np.arange(pairs) * 2
+        b = a + 1
+        meet = rng.uniform((0.2 * W, 0.2 * H), (0.8 * W, 0.8 * H), size=(pairs, 2))
+        when = rng.uniform(0.2 * frames, 0.8 * frames, size=pairs)
+        direction = velocity[a] / speed if speed > 0 else np.zeros((pairs, 2))
+        side = np.stack([-direction[:, 1], direction[:, 0]], axis=1) * rng.uniform(0, boxSize[0] / 2.0, (pairs, 1))
+        travel = (t - when[None, :]) * speed
+        x[:, a] = meet[:, 0] + side[:, 0] + direction[:, 0] * travel
+        y[:, a] = meet[:, 1] + side[:, 1] + direction[:, 1] * travel
+        x[:, b] = meet[:, 0] - side[:, 0] - direction[:, 0] * travel
+        y[:, b] = meet[:, 1] - side[:, 1] - direction[:, 1] * travel
+
+        # crossing objects are only seen while inside the frame
+        crossers = np.concatenate([a, b])
+        visible[:, crossers] = ((x[:, crossers] >= 0) & (x[:, crossers] < W) &
+                                (y[:, crossers] >= 0) & (y[:, crossers] < H))
+
+    # missed detections
+    visible &= rng.random((frames, count)) >= dropout
+
+    # jittered boxes around the true centers
+    (bw, bh) = boxSize
+    half = np.array([bw, bh, bw, bh], dtype="float64") / 2.0 * np.array([-1, -1, 1, 1])
+    centers = np.stack([x, y, x, y], axis=2)
+    boxes = centers + half + rng.normal(0, noise, size=(frames, count, 4))
+
+    scene = []
+    for f in range(frames):
+        ids = np.flatnonzero(visible[f])
+        scene.append((ids, boxes[f, ids].astype("int")))
+    return scene
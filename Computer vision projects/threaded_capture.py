@@ -0,0 +1,160 @@
+# import the necessary packages
+import threading
+import imutils
+import queue
+import time
+import cv2
+
+# queued after the last frame to tell the reader the stream is over
+_END = object()
+
+
+class ThreadedCapture:
+    def __init__(self, src, queueSize=8, policy="block", width=None, startFrame=0):
+        # read and decode (and optionally resize) the frames of a video
+        # file or camera in a background thread, so decoding overlaps
+        # with the processing of the previous frames. The decoded frames
+        # wait in a bounded queue, what happens when it is full depends
+        # on the policy:
+        #   block        -- the decoder waits, no frame is ever lost
+        #                   (video files)
+        #   drop-oldest  -- the oldest queued frame is dropped to make
+        #                   room for the new one
+        #   latest       -- only the most recent frame is kept (live
+        #                   cameras, the reader never lags behind)
+        # startFrame seeks a video file to that frame before decoding
+        if policy not in ("block", "drop-oldest", "latest"):
+            raise ValueError("unknown capture policy: {}".format(policy))
+
+        self.capture = cv2.VideoCapture(src)
+        self.policy = policy
+        self.width = width
+
+        # number of frames of a video file (0 for a live camera) and
+        # frame rate of the source (0 when unknown), read before the
+        # decoding thread owns the capture
+        self.frameCount = max(int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.startFrame = max(startFrame, 0)
+
+        # (W, H) of the frames read() returns, after the resize, or None
+        # when the source does not report its size
+        (W, H) = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frameSize = None
+        if W > 0 and H > 0:
+            self.frameSize = (W, H) if width is None else (width, int(H * (width / float(W))))
+        if startFrame > 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, startFrame)
+
+        # number of frames decoded and dropped so far
+        self.decoded = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=1 if policy == "latest" else queueSize)
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+        self._ended = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        if self.policy == "block":
+            # wait for room, but give up when the reader stops us
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _timestamp(self):
+        # position of the frame just decoded in the source, in
+        # milliseconds. A video file that reports no position gets it
+        # from its frame index and frame rate, only the live sources
+        # (most cameras report 0) fall back to the monotonic clock since
+        # the start
+        msec = self.capture.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0:
+            return msec
+        if self.frameCount > 0 and self.fps > 0:
+            return (self.startFrame + self.decoded) / self.fps * 1000.0
+        if self.decoded == 0 and self.frameCount > 0:
+            return msec
+        return (time.monotonic() - self._started) * 1000.0
+
+    def _run(self):
+        self._started = time.monotonic()
+        while not self._stopped.is_set():
+            (ret, frame) = self.capture.read()
+            if not ret:
+                break
+            msec = self._timestamp()
+            if self.width is not None:
+                frame = imutils.resize(frame, width=self.width)
+            self.decoded += 1
+            self._put((frame, msec))
+
+        self.capture.release()
+        # the end is a flag, the sentinel only wakes up a waiting reader
+        # and never evicts a frame: under drop-oldest and latest the last
+        # frame stays queued when there is no room for it
+        self._finished.set()
+        if self.policy == "block":
+            self._put(_END)
+        else:
+            try:
+                self._queue.put_nowait(_END)
+            except queue.Full:
+                pass
+
+    def read(self):
+        # same contract as cv2.VideoCapture.read: (True, frame), or
+        # (False, None) once the stream is over
+        (ret, frame, _) = self.readTimed()
+        return ret, frame
+
+    def readTimed(self):
+        # like read, plus the timestamp of the frame in the source in
+        # milliseconds (CAP_PROP_POS_MSEC): (True, frame, msec), or
+        # (False, None, None) once the stream is over
+        if self._ended:
+            return False, None, None
+
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                # every frame is queued before the flag is set, nothing
+                # is left once it is set and the queue is empty
+                if self._finished.is_set() and self._queue.empty():
+                    item = _END
+                    break
+        if item is _END:
+            self._ended = True
+            return False, None, None
+        return (True,) + item
+
+    def stop(self):
+        # stop decoding, e.g. when the user quits before the end of the
+        # video, and release the capture
+        self._stopped.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+        self._ended = True
@@ -0,0 +1,102 @@
+# import the necessary packages
+from nms import batched_nms
+import numpy as np
+
+
+def tile_starts(low, high, size, overlap):
+    # start positions of tiles of `size` covering [low, high), evenly
+    # spread so that neighbours overlap by at least `overlap` of a tile
+    if high - low <= size:
+        return np.array([low])
+    step = max(int(size * (1.0 - overlap)), 1)
+    count = int(np.ceil((high - low - size) / float(step))) + 1
+    return np.round(np.linspace(low, high - size, count)).astype("int")
+
+
+def tile_grid(region, tileSize, overlap):
+    # (startX, startY, endX, endY) tiles covering a region
+    (startX, startY, endX, endY) = region
+    (tileW, tileH) = tileSize
+    xs = tile_starts(startX, endX, tileW, overlap)
+    ys = tile_starts(startY, endY, tileH, overlap)
+    (x, y) = np.meshgrid(xs, ys)
+    (x, y) = (x.ravel(), y.ravel())
+    return np.column_stack([x, y, np.minimum(x + tileW, endX), np.minimum(y + tileH, endY)])
+
+
+class TiledDetector:
+    def __init__(self, detector, tileSize=(640, 360), overlap=0.2, rois=None, mask=None,
+                 mergeThreshold=0.5):
+        # run a detector on a high resolution frame without shrinking it:
+        # the frame is cut into overlapping tiles of tileSize (only
+        # inside the `rois` rectangles when given), all the tiles go
+        # through the network in one batched forward pass and their
+        # boxes are mapped back to the frame. The duplicates found on
+        # both sides of a seam are merged with NMS. `mask` is a single
+        # channel image of the frame size, zero where no one can appear:
+        # tiles falling entirely in such areas are never inferred and
+        # detections centered there are dropped
+        self.detector = detector
+        self.tileSize = tuple(tileSize)
+        self.overlap = overlap
+        self.rois = None if rois is None else np.asarray(rois, dtype="int").reshape(-1, 4)
+        self.mask = None if mask is None else (np.asarray(mask) > 0)
+        self.mergeThreshold = mergeThreshold
+
+        # tiles of the last frame size seen, recomputed when it changes
+        self.tiles = np.empty((0, 4), dtype="int")
+        self._frameSize = None
+
+    def _layout(self, W, H):
+        regions = self.rois if self.rois is not None else np.array([[0, 0, W, H]])
+        regions = np.clip(regions, 0, [W, H, W, H])
+        tiles = np.vstack([tile_grid(region, self.tileSize, self.overlap) for region in regions
+                           if region[2] > region[0] and region[3] > region[1]] or [np.empty((0, 4), dtype="int")])
+
+        # drop the tiles with nothing to look at
+        if self.mask is not None and len(tiles) > 0:
+            inside = np.cumsum(np.cumsum(np.pad(self.mask, ((1, 0), (1, 0))), axis=0), axis=1)
+            (x1, y1, x2, y2) = tiles.T
+            counts = inside[y2, x2] - inside[y1, x2] - inside[y2, x1] + inside[y1, x1]
+            tiles = tiles[counts > 0]
+        return tiles
+
+    def detect(self, frame):
+        # detect objects in a frame, returns an (N, 6) array of
+        # (startX, startY, endX, endY, score, class) in frame coordinates
+        (H, W) = frame.shape[:2]
+        if self._frameSize != (W, H):
+            if self.mask is not None and self.mask.shape[:2] != (H, W):
+                raise ValueError("mask of shape {} does not match the frame of shape {}".format(
+                    self.mask.shape, frame.shape))
+            self.tiles = self._layout(W, H)
+            self._frameSize = (W, H)
+
+        if len(self.tiles) == 0:
+            return np.empty((0, 6), dtype="float64")
+
+        # one forward pass for all the tiles, at the size of a full tile
+        crops = [frame[y1:y2, x1:x2] for (x1, y1, x2, y2) in self.tiles]
+        (tileW, tileH) = self.tileSize
+        results = self.detector.detectBatch(crops, self.detector.networkSize(tileW, tileH))
+
+        # move the boxes of every tile to its place in the frame
+        counts = [len(result) for result in results]
+        detections = np.vstack(results) if sum(counts) > 0 else np.empty((0, 6), dtype="float64")
+        offsets = np.repeat(self.tiles[:, :2], counts, axis=0)
+        detections[:, :4] += np.hstack([offsets, offsets])
+
+        if self.mask is not None and len(detections) > 0:
+            centerX = np.clip(((detections[:, 0] + detections[:, 2]) / 2).astype("int"), 0, W - 1)
+            centerY = np.clip(((detections[:, 1] + detections[:, 3]) / 2).astype("int"), 0, H - 1)
+            detections = detections[self.mask[centerY, centerX]]
+
+        # merge the seams: a box cut by a tile border is mostly inside
+        # the full box found in the neighbouring tile. The intersection
+        # is measured over the smaller of the two boxes, so the pair is
+        # merged whichever of them scores higher
+        if len(detections) > 0 and len(self.tiles) > 1:
+            keep = batched_nms(detections[:, :4], detections[:, 4], detections[:, 5],
+                               self.mergeThreshold, "min")
+            detections = detections[keep]
+        return detections
@@ -0,0 +1,216 @@
+# import the necessary packages
+from collections import OrderedDict
+from centroidtracker import MATCHERS, grid_pairs
+import numpy as np
+
+
+class TrackerPool:
+    def __init__(self, maxDisappeared=50, maxDistance=50, capacity=1024, matching="greedy"):
+        # a pool tracks the objects of many streams (cameras) at once.
+        # Each stream behaves exactly like its own CentroidTracker, with
+        # its own object IDs, but the state of every stream lives in
+        # the same struct of arrays so that all the streams that
+        # produced detections in a tick are updated in one batched pass
+        self._streamIndex = {}
+        self._streamNames = []
+        self._nextIDs = np.zeros(0, dtype="int64")
+
+        # one slot per tracked object: its object ID (-1 marks a free
+        # slot), the stream it belongs to, its centroid, its bounding
+        # box and the number of consecutive updates it has been missing
+        self.capacity = 0
+        self._ids = np.empty(0, dtype="int64")
+        self._streams = np.empty(0, dtype="int64")
+        self._centroids = np.empty((0, 2), dtype="float64")
+        self._boxes = np.empty((0, 4), dtype="float64")
+        self._disappeared = np.empty(0, dtype="int64")
+        self._grow(capacity)
+
+        # the matching is gated by a grid whose cells are maxDistance
+        # wide, a gate of zero (or less) would need unbounded cell keys
+        if maxDistance <= 0:
+            raise ValueError("maxDistance must be positive, got {}".format(maxDistance))
+        self.maxDisappeared = maxDisappeared
+        self.maxDistance = maxDistance
+
+        # only the sparse form of the matchers is used: candidate pairs
+        # never cross stream boundaries, so matching all the streams
+        # together gives the same result as matching them one by one
+        if matching not in MATCHERS:
+            raise ValueError("unknown matching strategy: {}".format(matching))
+        self.matching = matching
+
+    def _grow(self, capacity):
+        # enlarge the preallocated arrays, the new slots start free
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype="int64")])
+        self._streams = np.concatenate([self._streams, np.zeros(extra, dtype="int64")])
+        self._centroids = np.concatenate([self._centroids, np.zeros((extra, 2), dtype="float64")])
+        self._boxes = np.concatenate([self._boxes, np.zeros((extra, 4), dtype="float64")])
+        self._disappeared = np.concatenate([self._disappeared, np.zeros(extra, dtype="int64")])
+        self.capacity = capacity
+
+    def _stream(self, name):
+        # map a stream name to its index, adding new streams on the fly
+        index = self._streamIndex.get(name)
+        if index is None:
+            index = len(self._streamNames)
+            self._streamIndex[name] = index
+            self._streamNames.append(name)
+            self._nextIDs = np.append(self._nextIDs, 0)
+        return index
+
+    def _activeSlots(self, streams):
+        # grab the occupied slots of the given streams ordered by stream
+        # and then by object ID
+        selected = np.zeros(len(self._streamNames), dtype=bool)
+        selected[streams] = True
+        slots = np.flatnonzero(self._ids >= 0)
+        slots = slots[selected[self._streams[slots]]]
+        return slots[np.lexsort((self._ids[slots], self._streams[slots]))]
+
+    def _registerMany(self, streams, centroids, rects):
+        # claim a free slot for every new object, doubling the capacity
+        # whenever we run out of free slots
+        count = len(streams)
+        free = np.flatnonzero(self._ids < 0)
+        if len(free) < count:
+            capacity = max(self.capacity, 1)
+            while capacity - self.capacity + len(free) < count:
+                capacity *= 2
+            self._grow(capacity)
+            free = np.flatnonzero(self._ids < 0)
+
+        # the new objects come grouped by stream, so their rank inside
+        # their group is added to the next object ID of their stream
+        position = np.arange(count)
+        boundary = np.ones(count, dtype=bool)
+        boundary[1:] = streams[1:] != streams[:-1]
+        rank = position - np.maximum.accumulate(np.where(boundary, position, 0))
+
+        slots = free[:count]
+        self._ids[slots] = self._nextIDs[streams] + rank
+        self._streams[slots] = streams
+        self._centroids[slots] = centroids
+        self._boxes[slots] = rects
+        self._disappeared[slots] = 0
+        self._nextIDs += np.bincount(streams, minlength=len(self._nextIDs))
+
+    def _markDisappeared(self, slots):
+        # increment the disappeared counter of the given slots and free
+        # the slots of the objects that have been missing for too long
+        self._disappeared[slots] += 1
+        gone = slots[self._disappeared[slots] > self.maxDisappeared]
+        self._ids[gone] = -1
+
+    def _views(self, names, streams):
+        # build the backward compatible {objectID: bbox} view of each
+        # stream, slicing one sorted slot array instead of scanning the
+        # pool once per stream
+        slots = self._activeSlots(streams)
+        bounds = np.searchsorted(self._streams[slots], np.sort(streams), side="right")
+        groups = np.split(slots, bounds[:-1])
+        groups = dict(zip(np.sort(streams).tolist(), groups))
+
+        views = {}
+        for (name, stream) in zip(names, streams.tolist()):
+            group = groups[stream]
+            views[name] = OrderedDict(zip(self._ids[group].tolist(), self._boxes[group]))
+        return views
+
+    def streams(self):
+        # return the names of the streams seen so far
+        return list(self._streamNames)
+
+    def tracks(self, name=None):
+        # return the IDs, centroids and bounding boxes of the objects
+        # tracked in one stream as arrays -- without a stream name the
+        # objects of every stream are returned, preceded by the index
+        # (into streams()) of the stream each object belongs to
+        if name is None:
+            slots = self._activeSlots(np.arange(len(self._streamNames)))
+            return self._streams[slots], self._ids[slots], self._centroids[slots], self._boxes[slots]
+
+        if name not in self._streamIndex:
+            empty = np.empty(0, dtype="int64")
+            return empty, np.empty((0, 2)), np.empty((0, 4))
+
+        slots = self._activeSlots(np.array([self._streamIndex[name]]))
+        return self._ids[slots], self._centroids[slots], self._boxes[slots]
+
+    def bbox(self, name):
+        # return the {objectID: bbox} view of a single stream
+        (ids, _, boxes) = self.tracks(name)
+        return OrderedDict(zip(ids.tolist(), boxes))
+
+    def update(self, detections, views=True):
+        # detections maps a stream name to the bounding boxes it
+        # produced this tick -- streams that are absent are left
+        # untouched, streams with an empty list age their objects.
+        # Building the {objectID: bbox} views costs a little Python
+        # work per stream, callers reading tracks() can skip it
+        names = list(detections.keys())
+        if len(names) == 0:
+            return {} if views else None
+
+        streams = np.array([self._stream(name) for name in names], dtype="int64")
+        rects = [np.asarray(detections[name], dtype="float64").reshape(-1, 4) for name in names]
+        counts = np.array([len(r) for r in rects], dtype="int64")
+
+        # concatenate the inputs of all the streams, keeping them
+        # grouped by stream, and derive their centroids
+        inputRects = np.concatenate(rects)
+        inputStreams = np.repeat(streams, counts)
+        inputCentroids = ((inputRects[:, :2] + inputRects[:, 2:]) / 2.0).astype("int64")
+
+        # per stream: how many inputs and tracked objects it has
+        numStreams = len(self._streamNames)
+        inputCount = np.zeros(numStreams, dtype="int64")
+        inputCount[streams] = counts
+        slots = self._activeSlots(streams)
+        slotStreams = self._streams[slots]
+        trackCount = np.bincount(slotStreams, minlength=numStreams)
+
+        # lay the streams side by side along the x axis, far enough
+        # apart that no pair across two streams can fall inside the
+        # gate, and let a single grid pass find the candidate pairs of
+        # all the streams at once
+        (rows, cols) = (np.empty(0, dtype="int64"), np.empty(0, dtype="int64"))
+        if len(slots) > 0 and len(inputRects) > 0:
+            objectCentroids = self._centroids[slots]
+            low = min(objectCentroids[:, 0].min(), inputCentroids[:, 0].min())
+            high = max(objectCentroids[:, 0].max(), inputCentroids[:, 0].max())
+            stride = high - low + 2.0 * self.maxDistance + 1.0
+            objectCentroids = objectCentroids + np.stack([slotStreams * stride, np.zeros(len(slots))], axis=1)
+            shifted = inputCentroids + np.stack([inputStreams * stride, np.zeros(len(inputRects))], axis=1)
+            rows, cols, D = grid_pairs(objectCentroids, shifted, self.maxDistance)
+
+            (_, matchSparse) = MATCHERS[self.matching]
+            rows, cols = matchSparse(rows, cols, D, len(slots), self.maxDistance)
+
+        # update the matched objects and reset their disappeared
+        # counters
+        matched = slots[rows]
+        self._centroids[matched] = inputCentroids[cols]
+        self._boxes[matched] = inputRects[cols]
+        self._disappeared[matched] = 0
+
+        # like CentroidTracker, a stream with at least as many objects
+        # as inputs ages its unmatched objects, otherwise it registers
+        # its unmatched inputs as new objects
+        ages = trackCount >= inputCount
+        unusedRows = np.ones(len(slots), dtype=bool)
+        unusedRows[rows] = False
+        self._markDisappeared(slots[unusedRows & ages[slotStreams]])
+
+        unusedCols = np.ones(len(inputRects), dtype=bool)
+        unusedCols[cols] = False
+        unusedCols &= ~ages[inputStreams]
+        self._registerMany(inputStreams[unusedCols], inputCentroids[unusedCols], inputRects[unusedCols])
+
+        # return the set of trackable objects of every updated stream
+        if views:
+            return self._views(names, streams)
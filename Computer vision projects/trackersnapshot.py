@@ -0,0 +1,139 @@
+# import the necessary packages
+from centroidtracker import CentroidTracker
+import numpy as np
+import threading
+import json
+import os
+
+# a snapshot file is laid out as: the magic bytes, the length of the
+# JSON header as a little endian uint64, the JSON header itself and
+# then the raw arrays, each one starting on a 64 byte boundary so the
+# whole file can be memory mapped and viewed without any parsing
+MAGIC = b"CTSNAP01"
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path, config, counters, arrays, extra=None):
+    # lay out the arrays after a header describing them
+    extra = extra or {}
+    entries = {}
+    offset = 0
+    for (name, array) in arrays.items():
+        entries[name] = dict(dtype=array.dtype.str, shape=list(array.shape), offset=offset)
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps(dict(config=config, counters=counters, extra=extra, arrays=entries)).encode("utf-8")
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    size = max(start + offset, start + 1)
+
+    # write everything into a temporary memory mapped file and move it
+    # into place atomically, so a crash never leaves a torn snapshot
+    temp = path + ".tmp"
+    data = np.memmap(temp, dtype="uint8", mode="w+", shape=(size,))
+    data[:len(MAGIC)] = np.frombuffer(MAGIC, dtype="uint8")
+    data[len(MAGIC):len(MAGIC) + 8] = np.array([len(header)], dtype="<u8").view("uint8")
+    data[len(MAGIC) + 8:len(MAGIC) + 8 + len(header)] = np.frombuffer(header, dtype="uint8")
+    for (name, array) in arrays.items():
+        begin = start + entries[name]["offset"]
+        data[begin:begin + array.nbytes] = np.ascontiguousarray(array).reshape(-1).view("uint8")
+    data.flush()
+    del data
+    os.replace(temp, path)
+
+
+def read_snapshot(path):
+    # memory map the file and return read only views of its arrays
+    data = np.memmap(path, dtype="uint8", mode="r")
+    if data[:len(MAGIC)].tobytes() != MAGIC:
+        raise ValueError("not a tracker snapshot: {}".format(path))
+
+    length = int(data[len(MAGIC):len(MAGIC) + 8].view("<u8")[0])
+    header = json.loads(data[len(MAGIC) + 8:len(MAGIC) + 8 + length].tobytes().decode("utf-8"))
+    start = _aligned(len(MAGIC) + 8 + length)
+
+    arrays = {}
+    for (name, entry) in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype="int64"))
+        begin = start + entry["offset"]
+        raw = data[begin:begin + count * dtype.itemsize]
+        arrays[name] = raw.view(dtype).reshape(entry["shape"])
+
+    return header["config"], header["counters"], arrays, header["extra"]
+
+
+def save_snapshot(tracker, path, extra=None):
+    # checkpoint the full state of a tracker -- extra can carry small
+    # JSON serializable values (e.g. counters of the analytics)
+    (config, counters, arrays) = tracker.getState()
+    write_snapshot(path, config, counters, arrays, extra)
+
+
+def load_snapshot(path, trailSink=None, config=None):
+    # rebuild a tracker from a snapshot, returns the tracker and the
+    # extra values saved with it. config optionally holds the
+    # constructor arguments the caller builds its tracker with: a
+    # snapshot taken with other settings raises ValueError instead of
+    # silently bringing its own settings back
+    (stored, counters, arrays, extra) = read_snapshot(path)
+    if config is not None:
+        changed = sorted(key for key in config if stored.get(key) != config[key])
+        if changed:
+            raise ValueError("{} was taken with other tracker settings: {}".format(
+                path, ", ".join("{}={}".format(key, stored.get(key)) for key in changed)))
+    tracker = CentroidTracker(trailSink=trailSink, **stored)
+    tracker.setState(counters, arrays)
+    return tracker, extra
+
+
+class SnapshotWriter:
+    def __init__(self, tracker, path, interval=100):
+        # periodically checkpoint a tracker without stalling the frame
+        # loop: the state is copied on the calling thread (cheap) and
+        # written to disk by a background thread. If the previous write
+        # is still in progress the checkpoint is simply skipped
+        self.tracker = tracker
+        self.path = path
+        self.interval = interval
+        self.written = 0
+        self.skipped = 0
+        self._thread = None
+
+    def _write(self, state, extra):
+        (config, counters, arrays) = state
+        write_snapshot(self.path, config, counters, arrays, extra)
+        self.written += 1
+
+    def maybeSave(self, frameIndex, extra=None):
+        # call once per frame, a checkpoint is taken every `interval`
+        # frames
+        if frameIndex % self.interval != 0:
+            return False
+
+        if self._thread is not None and self._thread.is_alive():
+            self.skipped += 1
+            return False
+
+        state = self.tracker.getState()
+        self._thread = threading.Thread(target=self._write, args=(state, extra), daemon=True)
+        self._thread.start()
+        return True
+
+    def close(self, extra=None):
+        # wait for the pending write and take a final checkpoint
+        if self._thread is not None:
+            self._thread.join()
+        save_snapshot(self.tracker, self.path, extra)
+        self.written += 1
+
+    def discard(self):
+        # wait for the pending write and remove the snapshot, e.g. once
+        # the video is over and there is nothing left to resume
+        if self._thread is not None:
+            self._thread.join()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,50 @@
+# import the necessary packages
+from threaded_capture import ThreadedCapture
+
+
+def tracker_options(interval, **options):
+    # constructor arguments of a CentroidTracker fed by a detector that
+    # runs every `interval` frames. The tracker predicts the positions
+    # of the objects on the frames in between, with a Kalman filter
+    # unless the options say otherwise: it only pays off when frames
+    # are skipped, with a detection on every frame it just adds cost
+    # and lag
+    options.setdefault("kalman", interval > 1)
+    return options
+
+
+def open_capture(source, detector, width=600, **options):
+    # a ThreadedCapture of the source (the options are passed to it)
+    # with the detector warmed up at the size of its frames, so the
+    # first frame of the loop does not pay for the allocations of the
+    # network
+    cap = ThreadedCapture(source, width=width, **options)
+    if cap.frameSize is not None and hasattr(detector, "warmup"):
+        detector.warmup(*cap.frameSize)
+    return cap
+
+
+class DetectionTracker:
+    def __init__(self, detector, tracker, interval=1):
+        # the detect and track step of the person analytics scripts: the
+        # tracker predicts on every frame and the detector only runs on
+        # every `interval`-th one, its boxes update the tracker. A
+        # detector may also skip a frame by returning None (see
+        # GatedDetector), the tracks then stay where they are predicted
+        # like on the frames between two detections. Build the tracker
+        # with tracker_options(interval, ...)
+        self.detector = detector
+        self.tracker = tracker
+        self.interval = interval
+        self.frames = 0
+
+    def process(self, frame):
+        # detect (when it is the turn of this frame) and track one
+        # frame, returns the {objectID: bbox} of the tracked objects
+        objects = self.tracker.predict()
+        if self.frames % self.interval == 0:
+            detections = self.detector.detect(frame)
+            if detections is not None:
+                objects = self.tracker.update(detections[:, :4].astype("int"))
+        self.frames += 1
+        return objects
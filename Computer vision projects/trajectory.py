@@ -0,0 +1,82 @@
+# import the necessary packages
+import cv2
+import numpy as np
+
+
+class TrajectoryStore:
+    def __init__(self, length=64, sink=None):
+        # keep the last `length` centroids of every tracker slot in a
+        # fixed size ring buffer, so memory stays bounded however long
+        # an object is tracked. When an object is deregistered its
+        # trail is handed to the optional sink as sink(objectID, points)
+        # before the slot is cleared for reuse
+        self.length = length
+        self.sink = sink
+
+        self.capacity = 0
+        self._points = np.zeros((0, length, 2), dtype="float32")
+        self._head = np.zeros(0, dtype="int64")
+        self._count = np.zeros(0, dtype="int64")
+        self._lastFrame = np.zeros(0, dtype="int64")
+
+    def grow(self, capacity):
+        # follow the capacity of the tracker, the new slots start empty
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        self._points = np.concatenate([self._points, np.zeros((extra, self.length, 2), dtype="float32")])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype="int64")])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype="int64")])
+        self._lastFrame = np.concatenate([self._lastFrame, np.full(extra, -1, dtype="int64")])
+        self.capacity = capacity
+
+    def reset(self, slots):
+        # empty the trails of the given slots
+        self._head[slots] = 0
+        self._count[slots] = 0
+        self._lastFrame[slots] = -1
+
+    def push(self, slots, points, frame):
+        # append one point per slot -- a slot that already received a
+        # point for this frame has it replaced, so a trail holds at
+        # most one point per frame
+        again = slots[self._lastFrame[slots] == frame]
+        self._head[again] = (self._head[again] - 1) % self.length
+        self._count[again] -= 1
+
+        head = self._head[slots]
+        self._points[slots, head] = points
+        self._head[slots] = (head + 1) % self.length
+        self._count[slots] = np.minimum(self._count[slots] + 1, self.length)
+        self._lastFrame[slots] = frame
+
+    def trails(self, slots):
+        # gather the trails of the given slots, oldest point first, as
+        # an (N, length, 2) array plus the number of valid points of
+        # each trail
+        count = self._count[slots]
+        start = self._head[slots] - count
+        order = (start[:, None] + np.arange(self.length)[None, :]) % self.length
+        return self._points[slots[:, None], order], count
+
+    def evict(self, slots, objectIDs):
+        # hand the trails of the deregistered objects to the sink and
+        # clear their slots
+        if self.sink is not None and len(slots) > 0:
+            (points, count) = self.trails(slots)
+            for (objectID, trail, n) in zip(objectIDs.tolist(), points, count.tolist()):
+                self.sink(objectID, trail[:n].copy())
+
+        self.reset(slots)
+
+    def draw(self, frame, slots, color=(0, 255, 0), thickness=2):
+        # render every trail with a single cv2.polylines call
+        if len(slots) == 0:
+            return frame
+
+        (points, count) = self.trails(slots)
+        points = np.rint(points).astype("int32")
+        lines = [trail[:n] for (trail, n) in zip(points, count.tolist()) if n > 0]
+        cv2.polylines(frame, lines, False, color, thickness)
+        return frame